@@ -0,0 +1,34 @@
+import argparse
+import sys
+from unittest.mock import MagicMock
+
+sys.modules["servo"] = MagicMock()
+
+from hexapod.backends import REFERENCE, run_backends
+from hexapod.config import compile_body
+
+parser = argparse.ArgumentParser(
+    description="Check every math backend against the reference code."
+)
+parser.add_argument("--config", default="robot.json", help="Robot description.")
+parser.add_argument("--cases", type=int, default=2000, help="Random cases per kind.")
+parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+args = parser.parse_args()
+
+body = compile_body(args.config, MagicMock())
+report = run_backends(body, args.cases, args.seed)
+
+passed = True
+for kind, backends in report.items():
+    print(kind)
+    for name, result in backends.items():
+        if name != REFERENCE and not result["passed"]:
+            passed = False
+        print(
+            f"  {name:12s} {'ok' if result['passed'] else 'FAIL':4s} "
+            f"max error {result['max_error']:.2e} (tolerance {result['tolerance']:.0e}) "
+            f"failures {result['failures']:3d} "
+            f"{result['seconds'] * 1000:8.2f}ms {result['speedup']:6.2f}x"
+        )
+
+sys.exit(0 if passed else 1)
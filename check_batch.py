@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock
+
+sys.modules["servo"] = MagicMock()
+
+import numpy as np
+
+from hexapod.batch import BatchBody
+from hexapod.config import compile_body
+from hexapod.geometry_3d import Rotation, Transform, Vector
+from hexapod.motion import JointLimiter
+from hexapod.terrain import HeightMap, write_heightmap
+
+TICKS = 200
+
+config = sys.argv[1] if len(sys.argv) > 1 else "robot.json"
+
+
+def body_angles(body) -> list:
+    return [
+        [servo.angle for servo in (leg.coxa, leg.femur, leg.tibia)]
+        for leg in body.legs.values()
+    ]
+
+
+# Bodies walking in different directions from different poses.
+rng = np.random.default_rng(0)
+bodies = []
+for _ in range(8):
+    body = compile_body(config, MagicMock())
+    body.set_pose(
+        Vector(*rng.uniform(-20, 20, 2), rng.uniform(20, 60)),
+        Rotation(*rng.uniform(-10, 10, 3)),
+    )
+    body.update_velocity(Vector(*rng.uniform(-1, 1, 2), 0))
+    bodies.append(body)
+
+batch = BatchBody.from_bodies(bodies)
+error = 0.0
+for _ in range(TICKS):
+    batch.update()
+    for body in bodies:
+        body.update()
+    error = max(error, np.max(np.abs(batch.angles - [body_angles(b) for b in bodies])))
+
+pose = Transform(Vector(10, -5, 45), Rotation(5, -5, 10))
+batch.set_pose(np.array(pose.m[:3], dtype=float))
+for body in bodies:
+    body.set_pose(pose.get_vector(), pose.get_rotation())
+error = max(error, np.max(np.abs(batch.angles - [body_angles(b) for b in bodies])))
+print(f"BatchBody: {len(bodies)} bodies, largest servo angle error {error:.2e} degrees")
+assert error < 1e-3, "The batch simulation disagrees with Body."
+
+# Bodies whose updates the batch doesn't model are rejected.
+with tempfile.TemporaryDirectory() as folder:
+    path = os.path.join(folder, "flat.bin")
+    write_heightmap(path, [[0.0] * 4] * 4)
+    terrain = HeightMap(path)
+    for feature, body_kwargs in (
+        ("joint limiter", {"joint_limiter": JointLimiter()}),
+        ("keyframe IK", {"ik_interval": 3}),
+        ("terrain", {"terrain": terrain}),
+    ):
+        try:
+            BatchBody.from_body(compile_body(config, MagicMock(), **body_kwargs), 2)
+        except ValueError:
+            continue
+        raise AssertionError(f"A body with {feature} was batched.")
+    terrain.close()
+print("BatchBody matches Body.update and set_pose.")
@@ -0,0 +1,56 @@
+import math
+import random
+
+from hexapod.calibration import CalibrationTable
+
+# The largest error in degrees of a round trip through a table, which is only the
+# rounding of single precision samples.
+TOLERANCE = 1e-3
+# All 18 servos' tables have to fit in a few KB on the pico.
+MAX_TOTAL_BYTES = 4096
+
+measurements = {
+    "linear": [(c, c * 0.98 + 5) for c in range(-90, 91, 30)],
+    "inverted": [(c, 12 - c) for c in range(-90, 91, 30)],
+    "3 degree sinusoid": [
+        (c, c + 3 * math.sin(math.radians(c * 4))) for c in range(-90, 91, 5)
+    ],
+    "dead zone": [
+        (-90, -88),
+        (-60, -59),
+        (-30, -31),
+        (-5, 0),
+        (0, 0),
+        (5, 0),
+        (30, 29),
+        (60, 61),
+        (90, 92),
+    ],
+}
+
+rng = random.Random(0)
+for name, points in measurements.items():
+    table = CalibrationTable.fit(points)
+    _, loaded, _ = CalibrationTable.from_bytes(table.to_bytes(0))
+    size = len(table.to_bytes(0))
+
+    # Angles across the table and past either end, and the commands between.
+    low, high = sorted((table.angle_start, table.to_angle(table.raw[-1])))
+    error = table.round_trip_error()
+    for _ in range(2000):
+        angle = rng.uniform(low - 10, high + 10)
+        error = max(error, abs(loaded.to_angle(loaded.to_raw(angle)) - angle))
+        raw = rng.uniform(table.raw[0] - 10, table.raw[-1] + 10)
+        error = max(error, abs(loaded.to_raw(loaded.to_angle(raw)) - raw))
+    print(f"{name}: {size} bytes, largest round trip error {error:.2e} degrees")
+    assert error < TOLERANCE, f"The {name} table round trip is not the identity."
+    assert size * 18 <= MAX_TOTAL_BYTES, f"18 {name} tables exceed {MAX_TOTAL_BYTES}B."
+
+# A joint which barely moves over part of its range needs too many buckets.
+try:
+    CalibrationTable.fit([(0, 0), (1, 90), (90, 91)], resolution=91, max_buckets=64)
+except ValueError:
+    pass
+else:
+    raise AssertionError("A table larger than max_buckets was fitted.")
+print("Calibration tables round trip within their size bound.")
@@ -0,0 +1,47 @@
+import numpy as np
+
+from hexapod.collision import segment_distance
+
+# Brute force over this many points along each segment. The closest distance it
+# finds is within half a step of the exact one.
+SAMPLES = 2001
+
+
+def sampled_distance(p1, q1, p2, q2) -> float:
+    t = np.linspace(0, 1, SAMPLES)[:, None]
+    first = p1 + (q1 - p1) * t
+    second = p2 + (q2 - p2) * t
+    return np.min(np.linalg.norm(first[:, None] - second[None, :], axis=-1))
+
+
+point = np.array([5.0, 3, 0])
+segment = (np.array([0.0, 0, 0]), np.array([10.0, 0, 0]))
+cases = [
+    # A point against a segment, in both orders, and two points.
+    (*segment, point, point),
+    (point, point, *segment),
+    (point, point, point + 1, point + 1),
+    # Parallel and crossing segments.
+    (*segment, segment[0] + [2, 4, 0], segment[1] + [2, 4, 0]),
+    (*segment, np.array([5.0, -5, 2]), np.array([5.0, 5, 2])),
+]
+rng = np.random.default_rng(0)
+cases += [tuple(rng.uniform(-100, 100, (4, 3))) for _ in range(200)]
+# Random segments with a point on either side.
+cases += [
+    (p, p, *rng.uniform(-100, 100, (2, 3))) for p in rng.uniform(-100, 100, (50, 3))
+]
+cases += [
+    (*rng.uniform(-100, 100, (2, 3)), p, p) for p in rng.uniform(-100, 100, (50, 3))
+]
+
+expected = np.array([sampled_distance(*case) for case in cases])
+actual = segment_distance(*[np.array(values) for values in zip(*cases)])
+error = np.max(np.abs(actual - expected))
+print(f"segment_distance: {len(cases)} cases, largest error {error:.4f}mm")
+
+# The exact distance is never above the sampled one.
+assert np.all(actual <= expected + 1e-9), "Closer points were sampled."
+assert error < 0.2, "segment_distance disagrees with the sampled distance."
+assert np.allclose(actual[:2], 3), "A point against a segment is wrong."
+print("segment_distance matches the sampled distance.")
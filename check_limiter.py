@@ -0,0 +1,95 @@
+import json
+import random
+import sys
+from unittest.mock import MagicMock
+
+sys.modules["servo"] = MagicMock()
+
+from hexapod.config import compile_body
+from hexapod.geometry_3d import Rotation, Vector
+from hexapod.motion import JointLimiter
+from hexapod.sequences import compile_sequence
+
+# The limiter positions are single precision floats.
+TOLERANCE = 1e-3
+
+
+class Cluster:
+    """Records the last angle written to each pin."""
+
+    def __init__(self):
+        self.angles = {}
+
+    def value(self, pin, angle):
+        self.angles[pin] = angle
+
+
+config = sys.argv[1] if len(sys.argv) > 1 else "robot.json"
+
+# Step responses from rest never pass the target, or break the limits on the way.
+for step in (0.5, 1, 10, 45, 90, 180, 300):
+    for sign in (1, -1):
+        limiter = JointLimiter(0.02, joint_count=1)
+        limiter.reset([0])
+        target = sign * step
+        previous_velocity = 0.0
+        for _ in range(200):
+            position = limiter.step([target])[0]
+            velocity = limiter.velocity[0]
+            assert (
+                sign * (position - target) <= TOLERANCE
+            ), f"A {step} degree step overshoots to {position}."
+            assert abs(velocity) <= limiter.max_velocity[0] + TOLERANCE
+            acceleration = abs(velocity - previous_velocity) / limiter.period
+            assert acceleration <= limiter.max_acceleration[0] * (1 + TOLERANCE)
+            previous_velocity = velocity
+        assert (
+            abs(position - target) <= TOLERANCE
+        ), f"A {step} degree step never settles."
+print("Joint steps reach their targets without overshooting.")
+
+# Targets jumping between the servo limits never drive a servo past them.
+cluster = Cluster()
+body = compile_body(config, cluster, joint_limiter=JointLimiter())
+servos = [
+    servo for leg in body.legs.values() for servo in (leg.coxa, leg.femur, leg.tibia)
+]
+rng = random.Random(0)
+for _ in range(20):
+    body.set_pose(
+        Vector(rng.uniform(-80, 80), rng.uniform(-80, 80), rng.uniform(-40, 120)),
+        Rotation(*[rng.uniform(-40, 40) for _ in range(3)]),
+    )
+    for _ in range(rng.randint(1, 30)):
+        body.set_pose()
+        for servo in servos:
+            angle = cluster.angles[servo.pin_number]
+            assert (
+                servo.neg_limit - TOLERANCE <= angle <= servo.pos_limit + TOLERANCE
+            ), f"{servo.name} {servo.pin_number} written {angle}, outside its limits."
+print("No servo is written outside its limits.")
+
+# A sequence played after walking moves into its first frame within the limits.
+cluster = Cluster()
+body = compile_body(config, cluster, joint_limiter=JointLimiter())
+body.sequences = {
+    name: compile_sequence(body, name, keyframes)
+    for name, keyframes in json.load(open("sequences.json")).items()
+}
+for _ in body.play_sequence("home", direct=True):
+    pass
+for _ in body.play_sequence("stand"):
+    pass
+body.update_velocity(Vector(1, 0, 0))
+for _ in range(7):
+    body.update()
+max_step = body.joint_limiter.max_velocity[0] * body.update_frequency
+previous = dict(cluster.angles)
+for _ in body.play_sequence("sit"):
+    step = max(abs(cluster.angles[pin] - angle) for pin, angle in previous.items())
+    assert step <= max_step + TOLERANCE, f"A servo jumps {step} degrees in a frame."
+    previous = dict(cluster.angles)
+assert body.joint_limiter.settled(
+    body.sequences["sit"].frame_angles(len(body.sequences["sit"]) - 1, [0.0] * 18)
+), "The sequence ends before the servos reach its last frame."
+print("Sequences move from the gait within the joint limits.")
@@ -0,0 +1,31 @@
+import sys
+from unittest.mock import MagicMock
+
+sys.modules["servo"] = MagicMock()
+
+from hexapod.config import compile_body
+from hexapod.geometry_3d import Vector
+from hexapod.motion import JointLimiter
+from hexapod.realtime import measure_allocations
+
+
+class Cluster:
+    """Takes servo writes without allocating, unlike a MagicMock."""
+
+    def value(self, pin, angle):
+        return angle
+
+
+config = sys.argv[1] if len(sys.argv) > 1 else "robot.json"
+
+for mode, body_kwargs in (
+    ("every tick", {}),
+    ("keyframes", {"ik_interval": 3}),
+):
+    body = compile_body(config, Cluster(), joint_limiter=JointLimiter(), **body_kwargs)
+    body.update_velocity(Vector(1, 0.3, 0))
+    sites = measure_allocations(body)["sites"]
+    for site, per_tick in sites.items():
+        print(f"{mode}: {site} allocates {per_tick:.2f} objects per tick")
+    assert not sites, f"Update ticks with {mode} IK allocate objects."
+print("Update ticks allocate no objects.")
@@ -0,0 +1,13 @@
+import sys
+
+from hexapod.calibration import fit_file
+
+# Fit calibration tables from measured servo points and save them for main.py.
+# The JSON maps each servo pin to a list of [command angle, measured joint angle]
+# pairs, with the joint angle measured in the same frame the IK uses.
+source = sys.argv[1] if len(sys.argv) > 1 else "calibration.json"
+destination = sys.argv[2] if len(sys.argv) > 2 else "calibration.bin"
+resolution = int(sys.argv[3]) if len(sys.argv) > 3 else 19
+
+size = fit_file(source, destination, resolution)
+print(f"Compiled {source} to {destination} ({size} bytes).")
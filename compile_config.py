@@ -0,0 +1,11 @@
+import sys
+
+from hexapod.config import compile_file
+
+# Compile the robot description into the blob loaded by main.py, then upload it
+# with the rest of the project files.
+source = sys.argv[1] if len(sys.argv) > 1 else "robot.json"
+destination = sys.argv[2] if len(sys.argv) > 2 else "robot.bin"
+
+size = compile_file(source, destination)
+print(f"Compiled {source} to {destination} ({size} bytes).")
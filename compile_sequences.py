@@ -0,0 +1,24 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+sys.modules["servo"] = MagicMock()
+
+from hexapod.calibration import apply_tables, load_tables
+from hexapod.config import compile_body
+from hexapod.sequences import compile_sequence_file
+
+# Compile the scripted moves into the servo angle tables played by main.py. Every
+# frame is solved and checked against the servo limits here, so a move which can't
+# be reached fails now rather than on the robot. The angles depend on the config
+# and the calibration tables, so recompile whenever either changes.
+source = sys.argv[1] if len(sys.argv) > 1 else "sequences.json"
+destination = sys.argv[2] if len(sys.argv) > 2 else "sequences.bin"
+config = sys.argv[3] if len(sys.argv) > 3 else "robot.json"
+
+body = compile_body(config, MagicMock())
+if os.path.exists("calibration.bin"):
+    apply_tables(body, load_tables("calibration.bin"))
+
+size = compile_sequence_file(body, source, destination)
+print(f"Compiled {source} to {destination} ({size} bytes).")
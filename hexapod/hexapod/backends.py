@@ -0,0 +1,383 @@
+# Equivalence and speed checks of every math backend against the reference code, on
+# the same random inputs. New backends plug in with register_backend, and the
+# numpy backends are only registered when numpy is installed.
+
+import math
+import random
+import time
+
+from hexapod.geometry_3d import Point, Quaternion, Rotation, Transform, Vector
+from hexapod.interpolation import cubic_bez
+from hexapod.path_drawing import walk_cycle
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+KINDS = ("transform", "ik", "cubic_bez", "walk_cycle")
+REFERENCE = "reference"
+
+# kind -> backend name -> (run, prepare, tolerance)
+BACKENDS = {kind: {} for kind in KINDS}
+
+
+def register_backend(kind: str, name: str, tolerance: float = 0, prepare=None):
+    """
+    Register a backend as a decorator of the function which runs it. The function
+    takes the cases of its kind and returns one result per case, a sequence of
+    floats, or None or NaNs where the case fails, such as an IK target out of reach.
+    param kind: One of KINDS.
+    param name: The backend name, which is REFERENCE for the code the others are
+                checked against.
+    param tolerance: The largest difference allowed from the reference result.
+    param prepare: Converts the cases to the backend's own inputs before it's timed,
+                   such as into arrays.
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown backend kind {kind}, expected one of {KINDS}.")
+
+    def decorator(run):
+        BACKENDS[kind][name] = (run, prepare, tolerance)
+        return run
+
+    return decorator
+
+
+def transform_cases(rng: random.Random, count: int) -> list:
+    """Random transforms in any orientation, each with a point to apply it to."""
+    cases = []
+    for _ in range(count):
+        transform = Transform(
+            Vector(*[rng.uniform(-200, 200) for _ in range(3)]),
+            Rotation(*[rng.uniform(-180, 180) for _ in range(3)]),
+        )
+        cases.append((transform, Point(*[rng.uniform(-300, 300) for _ in range(3)])))
+    return cases
+
+
+def ik_cases(rng: random.Random, count: int, legs: list, out_of_reach=0.05) -> list:
+    """
+    Foot targets in the body frame across the whole workspace of each leg, found by
+    FK of random servo angles within their limits. Some are pushed out of reach so
+    the failures are checked too.
+    """
+    cases = []
+    for _ in range(count):
+        leg = rng.choice(legs)
+        angles = [
+            servo.get_angle(rng.uniform(servo.neg_limit, servo.pos_limit))
+            for servo in (leg.coxa, leg.femur, leg.tibia)
+        ]
+        tip = leg.forward_kinematics(*angles)[3]
+        if rng.random() < out_of_reach:
+            mount = leg.mount_transform.get_vector()
+            scale = 1 + (leg.coxa_len + leg.femur_len + leg.tib_len) / max(
+                1, math.sqrt((tip.x - mount.x) ** 2 + (tip.y - mount.y) ** 2)
+            )
+            tip = Point(
+                mount.x + (tip.x - mount.x) * scale,
+                mount.y + (tip.y - mount.y) * scale,
+                tip.z,
+            )
+        cases.append((leg, tip))
+    return cases
+
+
+def cubic_bez_cases(rng: random.Random, count: int) -> list:
+    """Random control values and a t in [0, 1]."""
+    return [
+        tuple(rng.uniform(-500, 500) for _ in range(4)) + (rng.random(),)
+        for _ in range(count)
+    ]
+
+
+def walk_cycle_cases(rng: random.Random, count: int, body) -> list:
+    """
+    Random gait phases of a body, each with a walking direction. Some are standing
+    still, and some start a half cycle, where the feet swap between the stance and
+    the swing.
+    """
+    cases = []
+    for _ in range(count):
+        t = rng.choice((0.0, 0.5)) if rng.random() < 0.05 else rng.random()
+        if rng.random() < 0.05:
+            velocity = Vector(0, 0, 0)
+        else:
+            velocity = Vector(*[rng.uniform(-1, 1) for _ in range(3)]).normalize()
+        cases.append((body, t, velocity))
+    return cases
+
+
+def run_backends(body, count: int = 2000, seed: int = 0, repeats: int = 3):
+    """
+    Run every registered backend on the same random cases, and compare each one to
+    the reference of its kind.
+    param body: The Body to generate IK targets for its legs and gait phases for.
+                The walk_cycle backends move its feet.
+    param count: Cases of each kind.
+    param repeats: Runs of each backend, keeping the fastest time.
+    return: kind -> backend name -> max_error, tolerance, failures (cases where
+            only one of the backend and the reference failed), passed, seconds and
+            speedup over the reference.
+    """
+    rng = random.Random(seed)
+    cases = {
+        "transform": transform_cases(rng, count),
+        "ik": ik_cases(rng, count, list(body.legs.values())),
+        "cubic_bez": cubic_bez_cases(rng, count),
+        "walk_cycle": walk_cycle_cases(rng, count, body),
+    }
+
+    report = {}
+    for kind in KINDS:
+        backends = BACKENDS[kind]
+        if REFERENCE not in backends:
+            raise ValueError(f"No {REFERENCE} backend registered for {kind}.")
+        results = {}
+        for name in backends:
+            results[name] = _time_backend(backends[name], cases[kind], repeats)
+
+        expected, reference_seconds = results[REFERENCE]
+        report[kind] = {}
+        for name, (actual, seconds) in results.items():
+            tolerance = backends[name][2]
+            max_error, failures = _compare(expected, actual)
+            report[kind][name] = {
+                "max_error": max_error,
+                "tolerance": tolerance,
+                "failures": failures,
+                "passed": failures == 0 and max_error <= tolerance,
+                "seconds": seconds,
+                "speedup": reference_seconds / seconds if seconds else math.inf,
+            }
+    return report
+
+
+def _time_backend(backend, cases: list, repeats: int):
+    run, prepare, _ = backend
+    inputs = cases if prepare is None else prepare(cases)
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = run(inputs)
+        best = min(best, time.perf_counter() - start)
+    return [_components(result) for result in results], best
+
+
+def _components(result):
+    """Get a result as a tuple of floats, or None if the case failed."""
+    if result is None:
+        return None
+    if isinstance(result, (int, float)):
+        result = (result,)
+    values = tuple(float(value) for value in result)
+    if any(math.isnan(value) for value in values):
+        return None
+    return values
+
+
+def _compare(expected: list, actual: list):
+    """Get the largest difference between two sets of results, and the mismatches."""
+    max_error = 0.0
+    failures = 0
+    for a, b in zip(expected, actual):
+        if a is None or b is None:
+            if a is not b:
+                failures += 1
+            continue
+        for x, y in zip(a, b):
+            max_error = max(max_error, abs(x - y))
+    failures += abs(len(expected) - len(actual))
+    return max_error, failures
+
+
+@register_backend("transform", REFERENCE)
+def _transform_reference(cases):
+    return [transform.apply(point).to_list() for transform, point in cases]
+
+
+@register_backend("transform", "scalar", 1e-12)
+def _transform_scalar(cases):
+    # The inline form used by the body's leg solve.
+    results = []
+    for transform, point in cases:
+        m = transform.m
+        x, y, z = point.x, point.y, point.z
+        results.append(
+            (
+                m[0][0] * x + m[0][1] * y + m[0][2] * z + m[0][3],
+                m[1][0] * x + m[1][1] * y + m[1][2] * z + m[1][3],
+                m[2][0] * x + m[2][1] * y + m[2][2] * z + m[2][3],
+            )
+        )
+    return results
+
+
+@register_backend(
+    "transform",
+    "quaternion",
+    1e-9,
+    prepare=lambda cases: [
+        (
+            Quaternion.from_rotation(transform.get_rotation()),
+            transform.get_vector(),
+            point,
+        )
+        for transform, point in cases
+    ],
+)
+def _transform_quaternion(cases):
+    return [(q.apply(point) + translation).to_list() for q, translation, point in cases]
+
+
+def _calculate_ik(leg, position: Point):
+    """
+    The original trig IK of Leg._calculate_ik, from before the IK was solved in
+    place, kept as the reference the Leg and faster IK are checked against.
+    """
+    a1 = math.degrees(math.atan2(position.y, position.x))
+
+    xyH = max(0, math.sqrt(position.y**2 + position.x**2) - leg.coxa_len)
+    zH = math.sqrt(position.z**2 + xyH**2)
+    if (leg.femur_len + leg.tib_len) <= zH:
+        raise ValueError(f"Reach distance {zH} exceeds femur + tibia length.")
+    z_theta = math.atan2(position.z, xyH)
+    a2cos = (leg.femur_len**2 + zH**2 - leg.tib_len**2) / (2 * leg.femur_len * zH)
+    a2 = math.degrees(math.acos(a2cos) + z_theta)
+
+    a3 = math.degrees(
+        math.acos(
+            (leg.femur_len**2 + leg.tib_len**2 - zH**2)
+            / (2 * leg.tib_len * leg.femur_len)
+        )
+    )
+
+    return (a1, a2, a3)
+
+
+@register_backend("ik", REFERENCE)
+def _ik_reference(cases):
+    results = []
+    for leg, target in cases:
+        try:
+            results.append(_calculate_ik(leg, leg.mount_offset.apply(target)))
+        except (ValueError, ZeroDivisionError):
+            # Out of reach, too close to fold to, or right on the femur joint.
+            results.append(None)
+    return results
+
+
+@register_backend("ik", "leg", 1e-9)
+def _ik_leg(cases):
+    results = []
+    for leg, target in cases:
+        try:
+            results.append(leg.solve(target))
+        except ValueError:
+            results.append(None)
+    return results
+
+
+@register_backend("ik", "in_place", 1e-9)
+def _ik_in_place(cases):
+    # The realtime solve, before the servo mapping.
+    results = []
+    for leg, target in cases:
+        m = leg.mount_offset.m
+        x, y, z = target.x, target.y, target.z
+        angles = [0.0, 0.0, 0.0]
+        solved = leg._calculate_ik_into(
+            m[0][0] * x + m[0][1] * y + m[0][2] * z + m[0][3],
+            m[1][0] * x + m[1][1] * y + m[1][2] * z + m[1][3],
+            m[2][0] * x + m[2][1] * y + m[2][2] * z + m[2][3],
+            angles,
+        )
+        results.append(angles if solved else None)
+    return results
+
+
+@register_backend("cubic_bez", REFERENCE)
+def _cubic_bez_reference(cases):
+    return [cubic_bez(*case, style="decasteljau") for case in cases]
+
+
+@register_backend("cubic_bez", "bernstein", 1e-9)
+def _cubic_bez_bernstein(cases):
+    return [cubic_bez(*case, style="bernstein") for case in cases]
+
+
+@register_backend("walk_cycle", REFERENCE)
+def _walk_cycle_reference(cases):
+    # The tripod gait as it was written with walk_cycle, before the feet were moved
+    # in place.
+    results = []
+    for body, t, velocity in cases:
+        stride = velocity * (body.max_velocity * body.walk_cycle_time / 4)
+        lift = Vector(0, 0, body.step_height * 2)
+        feet = []
+        for i, neutral in enumerate(body.foot_frames.values()):
+            leg_t = t if i % 2 == 0 else (t + 0.5) % 1
+            foot = walk_cycle(leg_t, neutral + stride, neutral - stride, neutral + lift)
+            feet.extend(foot.to_list())
+        results.append(feet)
+    return results
+
+
+@register_backend("walk_cycle", "move_feet", 1e-9)
+def _walk_cycle_move_feet(cases):
+    results = []
+    for body, t, velocity in cases:
+        body.current_velocity = velocity
+        body._move_feet(t)
+        results.append(
+            [value for foot in body.foot_positions.values() for value in foot.to_list()]
+        )
+    return results
+
+
+if np is not None:
+
+    def _transform_arrays(cases):
+        return (
+            np.array([transform.m[:3] for transform, _ in cases], dtype=float),
+            np.array([point.to_list() for _, point in cases]),
+        )
+
+    @register_backend("transform", "numpy", 1e-9, prepare=_transform_arrays)
+    def _transform_numpy(inputs):
+        matrices, points = inputs
+        return (
+            np.einsum("nij,nj->ni", matrices[..., :3], points) + matrices[..., 3]
+        ).tolist()
+
+    def _ik_arrays(cases):
+        lengths = np.array(
+            [(leg.coxa_len, leg.femur_len, leg.tib_len) for leg, _ in cases],
+            dtype=float,
+        )
+        inverses = np.array([leg.mount_offset.m[:3] for leg, _ in cases], dtype=float)
+        targets = np.array([target.to_list() for _, target in cases])
+        return lengths, inverses, targets
+
+    @register_backend("ik", "numpy", 1e-9, prepare=_ik_arrays)
+    def _ik_numpy(inputs):
+        # Imported here since the batch simulation imports the whole body.
+        from hexapod.batch import calculate_ik
+
+        lengths, inverses, targets = inputs
+        position = (
+            np.einsum("lij,lj->li", inverses[..., :3], targets) + inverses[..., 3]
+        )
+        angles, failed = calculate_ik(position, lengths)
+        angles[failed] = np.nan
+        return angles.tolist()
+
+    def _cubic_bez_arrays(cases):
+        return np.array(cases, dtype=float).T
+
+    @register_backend("cubic_bez", "numpy", 1e-9, prepare=_cubic_bez_arrays)
+    def _cubic_bez_numpy(inputs):
+        v1, v2, v3, v4, t = inputs
+        u = 1 - t
+        return (v1 * u**3 + 3 * v2 * u**2 * t + 3 * v3 * u * t**2 + v4 * t**3).tolist()
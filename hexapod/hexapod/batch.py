@@ -0,0 +1,260 @@
+# Struct of arrays simulation of many hexapods at once for the PC, such as for gait
+# searches. This needs numpy, so it is never imported on the pico.
+
+import numpy as np
+
+from hexapod.body import Body
+
+
+def _matrix(transform) -> np.ndarray:
+    return np.array(transform.m[:3], dtype=float)
+
+
+def calculate_ik(position: np.ndarray, lengths: np.ndarray):
+    """
+    Vectorized Leg._calculate_ik.
+    param position: (..., 3) leg tip positions in each leg's own frame.
+    param lengths: (..., 3) coxa, femur and tibia lengths of each leg.
+    return: The (..., 3) kinematic angles and a failure mask of the positions out
+            of reach.
+    """
+    x, y, z = np.moveaxis(position, -1, 0)
+    coxa, femur, tibia = np.moveaxis(lengths, -1, 0)
+
+    a1 = np.degrees(np.arctan2(y, x))
+    xy_h = np.maximum(0, np.hypot(x, y) - coxa)
+    z_h = np.hypot(z, xy_h)
+    z_theta = np.arctan2(z, xy_h)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a2_cos = (femur**2 + z_h**2 - tibia**2) / (2 * femur * z_h)
+        a3_cos = (femur**2 + tibia**2 - z_h**2) / (2 * tibia * femur)
+        a2 = np.degrees(np.arccos(a2_cos) + z_theta)
+        a3 = np.degrees(np.arccos(a3_cos))
+
+    failed = (
+        (femur + tibia <= z_h)
+        | (np.abs(a2_cos) > 1)
+        | (np.abs(a3_cos) > 1)
+        | ~np.isfinite(a2)
+    )
+    return np.stack([a1, a2, a3], axis=-1), failed
+
+
+class BatchBody:
+    """
+    N robots stepped together with vectorized gait evaluation, IK, clamping and FK.
+    Every leg parameter and all of the state is stored as arrays with a leading robot
+    axis, so a step costs a handful of numpy operations no matter how many robots
+    there are. A step matches Body.update, and from_bodies rejects the bodies it
+    wouldn't match, those with a joint limiter, keyframe IK, terrain or calibration
+    tables.
+    """
+
+    @staticmethod
+    def from_bodies(bodies: list[Body]) -> "BatchBody":
+        """Copy the geometry, servo limits and state of each Body into a batch."""
+        for body in bodies:
+            unsupported = (
+                ("a joint limiter", body.joint_limiter is not None),
+                ("an ik_interval above 1", body.ik_interval > 1),
+                ("terrain", body.terrain is not None),
+            )
+            for feature, used in unsupported:
+                if used:
+                    raise ValueError(
+                        f"The body has {feature}, which the batch simulation does "
+                        "not support."
+                    )
+
+        batch = BatchBody()
+        legs = [list(body.legs.values()) for body in bodies]
+        servos = [
+            [(leg.coxa, leg.femur, leg.tibia) for leg in body_legs]
+            for body_legs in legs
+        ]
+        for body_servos in servos:
+            for leg in body_servos:
+                for servo in leg:
+                    if servo.calibration is not None:
+                        raise ValueError(
+                            f"{servo.name} has a calibration table, which the batch "
+                            "simulation does not support."
+                        )
+
+        batch.mount_inverse = np.array(
+            [[_matrix(leg.mount_offset) for leg in body_legs] for body_legs in legs]
+        )
+        batch.mount = np.array(
+            [[_matrix(leg.mount_transform) for leg in body_legs] for body_legs in legs]
+        )
+        batch.lengths = np.array(
+            [
+                [(leg.coxa_len, leg.femur_len, leg.tib_len) for leg in body_legs]
+                for body_legs in legs
+            ],
+            dtype=float,
+        )
+        batch.zeroed = np.array(
+            [[[s.zeroed_angle for s in leg] for leg in body] for body in servos],
+            dtype=float,
+        )
+        batch.inverted = np.array(
+            [[[s.inverted for s in leg] for leg in body] for body in servos],
+            dtype=bool,
+        )
+        batch.pos_limit = np.array(
+            [[[s.pos_limit for s in leg] for leg in body] for body in servos],
+            dtype=float,
+        )
+        batch.neg_limit = np.array(
+            [[[s.neg_limit for s in leg] for leg in body] for body in servos],
+            dtype=float,
+        )
+        batch.angles = np.array(
+            [[[s.angle for s in leg] for leg in body] for body in servos],
+            dtype=float,
+        )
+        batch.enabled = np.array(
+            [[leg.enabled for leg in body_legs] for body_legs in legs], dtype=bool
+        )
+
+        batch.foot_frames = np.array(
+            [[foot.to_list() for foot in body.foot_frames.values()] for body in bodies]
+        )
+        batch.foot_positions = np.array(
+            [
+                [foot.to_list() for foot in body.foot_positions.values()]
+                for body in bodies
+            ]
+        )
+        batch.pose = np.array([_matrix(body.relative_position) for body in bodies])
+        batch.velocity = np.array([body.current_velocity.to_list() for body in bodies])
+        batch.max_velocity = np.array([body.max_velocity for body in bodies])
+        batch.walk_cycle_time = np.array([body.walk_cycle_time for body in bodies])
+        batch.step_height = np.array([body.step_height for body in bodies])
+        batch.update_frequency = np.array([body.update_frequency for body in bodies])
+        batch.gait_phase = np.array([body.gait_phase for body in bodies])
+
+        if any(body.current_gait != "tripod" for body in bodies):
+            raise ValueError("Only the tripod gait is implemented.")
+        # Alternating legs share a phase, the same as Body._tripod_gait.
+        leg_count = batch.lengths.shape[1]
+        batch.phase_offset = np.where(np.arange(leg_count) % 2 == 0, 0.0, 0.5)
+        batch.ik_failures = np.zeros(batch.enabled.shape, dtype=bool)
+        return batch
+
+    @staticmethod
+    def from_body(body: Body, count: int) -> "BatchBody":
+        """Create a batch of identical copies of a Body."""
+        return BatchBody.from_bodies([body] * count)
+
+    def __len__(self):
+        return len(self.gait_phase)
+
+    def update(self):
+        """Advance every robot by one tick, the same as Body.update."""
+        self._tripod_gait(self.gait_phase)
+        self.gait_phase = (
+            self.gait_phase + self.update_frequency / self.walk_cycle_time
+        ) % 1
+
+    def set_pose(self, pose: np.ndarray):
+        """
+        Move every body while the feet stay planted, the same as Body.set_pose.
+        param pose: (N, 3, 4) or (3, 4) body transforms relative to the ground frame.
+        """
+        self.pose = np.broadcast_to(pose, self.pose.shape).copy()
+        self._solve_legs()
+
+    def forward_kinematics(self) -> np.ndarray:
+        """
+        Get the joint positions of every leg from the current servo angles, the same
+        as Leg.forward_kinematics.
+
+        Returns:
+            (N, legs, 4, 3) mount, femur, tibia and tip positions in the body frame.
+        """
+        kinematic = np.where(
+            self.inverted, self.zeroed - self.angles, self.angles + self.zeroed
+        )
+        a1 = np.radians(kinematic[..., 0])
+        femur_angle = np.radians(kinematic[..., 1])
+        tibia_angle = femur_angle + np.radians(kinematic[..., 2]) - np.pi
+
+        coxa, femur, tibia = np.moveaxis(self.lengths, -1, 0)
+        reach = np.stack(
+            [
+                np.zeros_like(coxa),
+                coxa,
+                coxa + femur * np.cos(femur_angle),
+                coxa + femur * np.cos(femur_angle) + tibia * np.cos(tibia_angle),
+            ],
+            axis=-1,
+        )
+        height = np.stack(
+            [
+                np.zeros_like(coxa),
+                np.zeros_like(coxa),
+                femur * np.sin(femur_angle),
+                femur * np.sin(femur_angle) + tibia * np.sin(tibia_angle),
+            ],
+            axis=-1,
+        )
+        joints = np.stack(
+            [
+                reach * np.cos(a1)[..., None],
+                reach * np.sin(a1)[..., None],
+                height,
+            ],
+            axis=-1,
+        )
+        return (
+            np.einsum("nlij,nlkj->nlki", self.mount[..., :3], joints)
+            + self.mount[:, :, None, :, 3]
+        )
+
+    def foot_tips(self) -> np.ndarray:
+        """Get the (N, legs, 3) FK leg tip positions in the ground frame."""
+        tips = self.forward_kinematics()[:, :, 3]
+        return (
+            np.einsum("nij,nlj->nli", self.pose[..., :3], tips)
+            + self.pose[:, None, :, 3]
+        )
+
+    def _tripod_gait(self, t: np.ndarray):
+        stride = self.velocity * (self.max_velocity * self.walk_cycle_time / 4)[:, None]
+        forward = self.foot_frames + stride[:, None]
+        backward = self.foot_frames - stride[:, None]
+        lift = self.foot_frames.copy()
+        lift[..., 2] += self.step_height[:, None] * 2
+
+        # Per leg phase, then the walk_cycle lerp and quadratic bezier halves.
+        leg_t = ((t[:, None] + self.phase_offset) % 1)[..., None]
+        stance = leg_t < 0.5
+        s = np.where(stance, leg_t * 2, (leg_t - 0.5) * 2)
+        lerp = forward + (backward - forward) * s
+        a = backward + (lift - backward) * s
+        b = lift + (forward - lift) * s
+        swing = a + (b - a) * s
+        self.foot_positions = np.where(stance, lerp, swing)
+        self._solve_legs()
+
+    def _solve_legs(self):
+        # Ground frame -> body frame with one inverse per body, then body -> leg.
+        rotation = self.pose[..., :3]
+        translation = self.pose[..., 3]
+        body = np.einsum(
+            "nji,nlj->nli", rotation, self.foot_positions - translation[:, None]
+        )
+        position = (
+            np.einsum("nlij,nlj->nli", self.mount_inverse[..., :3], body)
+            + self.mount_inverse[..., 3]
+        )
+        kinematic, failed = calculate_ik(position, self.lengths)
+
+        raw = np.where(self.inverted, self.zeroed - kinematic, kinematic - self.zeroed)
+        raw = np.clip(raw, self.neg_limit, self.pos_limit)
+        # Failed legs hold their last angles, and disabled legs are never written.
+        write = (self.enabled & ~failed)[..., None]
+        self.angles = np.where(write, raw, self.angles)
+        self.ik_failures = failed & self.enabled
@@ -1,6 +1,14 @@
-from hexapod.geometry_3d import Point, Transform, Vector, Rotation
-from hexapod.interpolation import lerp_3d, quad_bez_3d
+import math
+from array import array
+
+from hexapod.geometry_3d import Point, Quaternion, Transform, Vector, Rotation
+from hexapod.interpolation import catmull_rom, cosine_ease_t, lerp, lerp_3d, quad_bez
 from hexapod.leg import Leg
+from hexapod.motion import JointLimiter
+from hexapod.path_drawing import lift_point, walk_cycle
+from hexapod.sequences import Sequence
+from hexapod.terrain import HeightMap
+from hexapod.timing import sleep_ms, ticks_diff, ticks_us
 
 
 class Body:
@@ -13,13 +21,60 @@ class Body:
         initial_rotation: float = 0,
         update_frequency: float = 1 / 50,
         max_velocity: float = 20,
+        walk_cycle_time: float = 1.5,
+        step_height: float = 30,
+        joint_limiter: JointLimiter | None = None,
+        telemetry: "TelemetryRing | None" = None,
+        terrain: HeightMap | None = None,
+        ik_interval: int = 1,
+        measure_ik_error: bool = False,
+        sequences: dict[str, Sequence] | None = None,
     ):
-        """legs are ordered in right front, clockwise around the body."""
+        """
+        legs are ordered in right front, clockwise around the body.
+        param initial_position: The body pose relative to the ground frame beneath it.
+                                The z translation is the body height above the ground.
+        param update_frequency: Time in seconds between each update tick.
+        param max_velocity: Body speed in mm/s when walking at full velocity.
+        param walk_cycle_time: Time in seconds for a full step cycle of each leg.
+        param step_height: Height in mm the feet are lifted during the swing phase.
+        param joint_limiter: Optional velocity and acceleration limits applied to the
+                             servo angles between the IK and the servos. Its period
+                             is set to update_frequency.
+        param telemetry: Optional hexapod.telemetry.TelemetryRing which records every
+                         update tick. It isn't imported here, so the body doesn't
+                         need _thread.
+        param terrain: Optional height map the feet are placed on while walking,
+                       rather than flat ground.
+        param ik_interval: Only solve the IK every this many ticks, and interpolate
+                           the servo angles of the ticks between with Catmull-Rom
+                           splines. The keyframes are solved two intervals ahead of
+                           the gait, so most ticks do no IK at all.
+        param measure_ik_error: Also solve the IK every tick, and track how far the
+                                interpolated feet are from it. See foot_error.
+        param sequences: Compiled scripted moves from hexapod.sequences.load_sequences,
+                       such as home, stand and sit.
+        """
+        if terrain is not None and ik_interval > 1:
+            raise ValueError("The terrain gait can't run between keyframes.")
         self.legs = legs
-        self.foot_frames = self._set_foot_frames(legs)
+        # Indexed copies of the legs, as iterating a dict allocates on MicroPython.
+        self._leg_names = list(legs)
+        self._leg_list = list(legs.values())
 
         self.update_frequency = update_frequency
         self.max_velocity = max_velocity
+        self.walk_cycle_time = walk_cycle_time
+        self.step_height = step_height
+        self.joint_limiter = joint_limiter
+        if joint_limiter is not None:
+            # Stepped once per tick, so its limits are scaled by the tick period.
+            joint_limiter.period = update_frequency
+        self._servo_targets = array("f", [0] * (len(legs) * 3))
+        self.telemetry = telemetry
+        self.tick = 0
+        # Bit mask of the legs whose IK failed on the last solve.
+        self.ik_failures = 0
 
         self.relative_position = (
             Transform(Vector(0, 0, 0), Rotation(0, 0, 0))
@@ -27,9 +82,44 @@ class Body:
             else initial_position
         )
         self.relative_rotation = initial_rotation
+        # The inverse of relative_position, kept until the pose changes.
+        self._inverse = None
+        self._inverse_of = None
+
+        # Servo angle keyframes k - 1 to k + 2 in a ring from _keyframe_head, and the
+        # pose and velocity they were solved for.
+        self.ik_interval = ik_interval
+        self._keyframes = [array("f", [0] * (len(legs) * 3)) for _ in range(4)]
+        self._keyframe_head = 0
+        self._keyframe_tick = 0
+        self._keyframe_pose = None
+        self._keyframe_velocity = None
+
+        self.measure_ik_error = measure_ik_error
+        self._exact_targets = array("f", [0] * (len(legs) * 3))
+        self.foot_error_max = 0.0
+        self._foot_error_total = 0.0
+        self._foot_error_samples = 0
+
+        self.sequences = {} if sequences is None else sequences
+
+        # Neutral and current foot positions in the ground frame.
+        self.foot_frames = self._set_foot_frames(legs)
+        self.foot_positions = {
+            name: foot.copy() for name, foot in self.foot_frames.items()
+        }
 
         self.current_gait = self.gaits[0]
         self.current_velocity = Vector(0, 0, 0)
+        self.gait_phase = 0.0
+
+        # Odometry of the ground frame in the world, used to find the terrain under
+        # the feet. The ground frame's z follows the terrain under the body.
+        self.terrain = terrain
+        self.world_position = Point(0, 0, 0)
+        self._terrain_x = array("f", [0] * (len(legs) * 2 + 1))
+        self._terrain_y = array("f", [0] * (len(legs) * 2 + 1))
+        self._terrain_z = array("f", [0] * (len(legs) * 2 + 1))
 
     def go_to_home(self):
         """
@@ -37,12 +127,133 @@ class Body:
         have been physically moved, so this assumes the body is in contact with
         the ground, and we can home the legs to a known position off the ground.
         This will happen as fast as the servos can move, so it's the safest way to
-        initialize known positions.
+        initialize known positions. The move is the compiled "home" sequence.
+        """
+        self.perform("home", direct=True)
+
+    def perform(self, name: str, direct: bool = False):
+        """
+        Play a compiled sequence to the end, waiting a frame period between each.
+        See play_sequence.
+        """
+        period_ms = round(self._sequence(name).period * 1000)
+        for _ in self.play_sequence(name, direct):
+            sleep_ms(period_ms)
+
+    def play_sequence(self, name: str, direct: bool = False):
+        """
+        Play a compiled sequence, writing one frame of servo angles each time the
+        generator is advanced. No IK is solved, and when the sequence ends, the body
+        pose, feet and joint limiter are set to its last frame so the gait carries
+        on from there.
+        With a joint limiter, the frames are its targets, so the servos move from
+        wherever the gait left them into the first frame within the joint limits.
+        The generator then carries on until the servos settle on the last frame.
+        param direct: Write every frame straight to the servos, for when the servo
+                      angles are unknown, such as homing after power on.
         """
-        pass
+        sequence = self._sequence(name)
+        targets = self._servo_targets
+        limiter = None if direct else self.joint_limiter
+        for frame in range(len(sequence)):
+            if limiter is None:
+                sequence.write_frame(self._leg_list, frame)
+            else:
+                self._write_targets(sequence.frame_angles(frame, targets), 0)
+            yield frame
+
+        if limiter is not None:
+            while not limiter.settled(targets):
+                self._write_targets(targets, 0)
+                yield frame
+
+        self.relative_position = sequence.pose
+        for leg_name, foot in zip(self._leg_names, sequence.feet):
+            self.foot_positions[leg_name] = foot.copy()
+        sequence.frame_angles(len(sequence) - 1, targets)
+        if self.joint_limiter is not None:
+            self.joint_limiter.reset(targets)
 
     def update(self):
-        pass
+        """Advance the current gait by one tick and update all of the legs."""
+        start = ticks_us()
+        self._move(self.gait_phase)
+        self.gait_phase = (
+            self.gait_phase + self.update_frequency / self.walk_cycle_time
+        ) % 1
+        step = self.max_velocity * self.update_frequency
+        self.world_position.x += self.current_velocity.x * step
+        self.world_position.y += self.current_velocity.y * step
+
+        if self.telemetry is not None:
+            self.telemetry.record(
+                self.tick,
+                ticks_diff(ticks_us(), start),
+                self.ik_failures,
+                self._leg_list,
+            )
+        self.tick += 1
+
+    def set_pose(
+        self,
+        translation: Vector | None = None,
+        rotation: Rotation | Quaternion | None = None,
+    ):
+        """
+        Move the body relative to the ground frame while the feet stay planted, and
+        re-solve every leg for the new pose.
+        param translation: Body offset from the ground frame, z being the body height.
+                           If None, the current translation is kept.
+        param rotation: Body roll, pitch and yaw as a Rotation about x, y and z, or
+                        an orientation Quaternion. If None, the current rotation is kept.
+        return: The raw servo angles written, 3 per leg. See _solve_legs.
+        """
+        if translation is None:
+            translation = self.relative_position.get_vector()
+        if rotation is None:
+            rotation = self.relative_position.get_rotation()
+        elif isinstance(rotation, Quaternion):
+            rotation = rotation.to_rotation()
+        self.relative_position = Transform(translation, rotation)
+        return self._solve_legs()
+
+    def transition_pose(
+        self, translation: Vector, orientation: Quaternion, duration: float
+    ):
+        """
+        Smoothly move the body to a new pose over a duration while the feet stay
+        planted, one update tick for each step. The orientation is slerped, so the
+        body takes the shortest rotation without any gimbal lock.
+        param translation: The final body offset from the ground frame.
+        param orientation: The final body orientation.
+        param duration: Time in seconds for the transition.
+        return: A generator which sets the next pose each time it is advanced.
+        """
+        start = self.relative_position.get_vector()
+        start_orientation = Quaternion.from_rotation(
+            self.relative_position.get_rotation()
+        )
+        steps = max(1, round(duration / self.update_frequency))
+        ts = [cosine_ease_t((i + 1) / steps) for i in range(steps)]
+        orientations = Quaternion.slerp_batch(start_orientation, orientation, ts)
+        for t, q in zip(ts, orientations):
+            yield self.set_pose(lerp_3d(start, translation, t), q)
+
+    def foot_error(self) -> dict:
+        """
+        Get the distance in mm between the FK leg tips of the interpolated servo
+        angles and those of solving the IK every tick, when measure_ik_error is on.
+        Both are before the joint limiter, so this is only the interpolation error.
+        """
+        return {
+            "samples": self._foot_error_samples,
+            "max_mm": self.foot_error_max,
+            "mean_mm": (
+                self._foot_error_total / self._foot_error_samples
+                if self._foot_error_samples
+                else 0.0
+            ),
+        }
 
     def update_velocity(self, velocity: Vector):
         self.current_velocity = velocity.normalize()
@@ -62,17 +273,43 @@ class Body:
 
         self.current_gait = gait
 
+    def _sequence(self, name: str) -> Sequence:
+        sequence = self.sequences.get(name)
+        if sequence is None:
+            raise ValueError(
+                f"Sequence {name} not found. Compile it with sequences.json."
+            )
+        if sequence.joint_count != len(self._servo_targets):
+            raise ValueError(f"Sequence {name} was compiled for a different body.")
+        return sequence
+
     def _set_foot_frames(self, legs: dict[str, Leg]):
+        """
+        Get the neutral foot positions on the ground plane, straight out from each leg
+        mount at half of the femur and tibia reach.
+        """
         foot_frames = {}
         for name, leg in legs.items():
-            leg.change_global_position(self.relative_position)
-            base = leg.pos_from_global
+            mount = leg.mount_transform
             offset = leg.coxa_len + (leg.femur_len + leg.tib_len) / 2
-            foot_frames[name] = (
-                base.position() + base.translation().normalize() * offset
-            )
+            direction = Vector(mount.m[0][0], mount.m[1][0], 0).normalize()
+            foot = self.relative_position.apply(mount.get_vector() + direction * offset)
+            foot.z = 0
+            foot_frames[name] = foot
         return foot_frames
 
+    def _solve_legs(self):
+        """
+        Solve and set every leg for the current foot positions, without allocating
+        any objects, so update can run with the garbage collector disabled. See
+        hexapod.realtime.RealtimeLoop. With a joint limiter, all 18 servo angles are
+        solved first and limited together before any servo is written. A leg whose
+        target is out of reach is left where it is and flagged in ik_failures.
+        return: The raw servo angles written, 3 per leg.
+        """
+        self.ik_failures = self._solve_targets(self._servo_targets)
+        return self._write_targets(self._servo_targets, self.ik_failures)
+
     def _move(self, t: float):
         if self.current_gait == "tripod":
             self._tripod_gait(t)
@@ -81,6 +318,223 @@ class Body:
 
     def _tripod_gait(self, t: float):
         """
-        Move the hexapod in a tripod gait pattern.
+        Move the hexapod in a tripod gait pattern. Alternating legs share a phase,
+        and the two tripods are half a cycle apart. Every tick moves the feet with
+        _move_feet, except over terrain, so each path is the same gait.
+        """
+        if self.terrain is not None:
+            stride = self.current_velocity * (
+                self.max_velocity * self.walk_cycle_time / 4
+            )
+            self._terrain_gait(t, stride)
+        elif self.ik_interval > 1:
+            self._keyframe_gait(t)
+        else:
+            self._move_feet(t)
+            self._solve_legs()
+
+    def _keyframe_gait(self, t: float):
+        """
+        The tripod gait with the IK solved every ik_interval ticks. Each tick is a
+        Catmull-Rom spline through the keyframes either side of it, so only the
+        keyframe two intervals ahead has to be solved at the start of an interval.
+        The keyframes are all solved again from the current phase when the pose or
+        velocity changes.
+        """
+        interval = self.ik_interval
+        frames = self._keyframes
+        phase_step = interval * self.update_frequency / self.walk_cycle_time
+        if (
+            self._keyframe_pose is not self.relative_position
+            or self._keyframe_velocity is not self.current_velocity
+        ):
+            # Start from the commanded angles, so a leg out of reach holds still.
+            for leg_index in range(len(self._leg_list)):
+                leg = self._leg_list[leg_index]
+                for frame in frames:
+                    frame[leg_index * 3] = leg.coxa.angle
+                    frame[leg_index * 3 + 1] = leg.femur.angle
+                    frame[leg_index * 3 + 2] = leg.tibia.angle
+            failures = 0
+            for i in range(4):
+                self._move_feet((t + (i - 1) * phase_step) % 1)
+                failures |= self._solve_targets(frames[i])
+            self.ik_failures = failures
+            self._keyframe_head = 0
+            self._keyframe_tick = 0
+            self._keyframe_pose = self.relative_position
+            self._keyframe_velocity = self.current_velocity
+        elif self._keyframe_tick == 0:
+            # The oldest keyframe becomes the one two intervals ahead, starting from
+            # the one before it so a leg out of reach holds still.
+            newest = frames[(self._keyframe_head + 3) % 4]
+            self._keyframe_head = (self._keyframe_head + 1) % 4
+            ahead = frames[(self._keyframe_head + 3) % 4]
+            for i in range(len(ahead)):
+                ahead[i] = newest[i]
+            self._move_feet((t + 2 * phase_step) % 1)
+            self.ik_failures = self._solve_targets(ahead)
+
+        head = self._keyframe_head
+        k0 = frames[head]
+        k1 = frames[(head + 1) % 4]
+        k2 = frames[(head + 2) % 4]
+        k3 = frames[(head + 3) % 4]
+        s = self._keyframe_tick / interval
+        targets = self._servo_targets
+        for i in range(len(targets)):
+            targets[i] = catmull_rom(k0[i], k1[i], k2[i], k3[i], s)
+        self._keyframe_tick = (self._keyframe_tick + 1) % interval
+
+        # The feet of this tick, rather than the last keyframe.
+        self._move_feet(t)
+        if self.measure_ik_error:
+            self._measure_foot_error(targets)
+        self._write_targets(targets, 0)
+
+    def _measure_foot_error(self, targets):
+        exact = self._exact_targets
+        for i in range(len(exact)):
+            exact[i] = targets[i]
+        self._solve_targets(exact)
+        for i in range(len(self._leg_list)):
+            leg = self._leg_list[i]
+            j = i * 3
+            tip = leg.forward_kinematics(
+                leg.coxa.get_angle(targets[j]),
+                leg.femur.get_angle(targets[j + 1]),
+                leg.tibia.get_angle(targets[j + 2]),
+            )[3]
+            exact_tip = leg.forward_kinematics(
+                leg.coxa.get_angle(exact[j]),
+                leg.femur.get_angle(exact[j + 1]),
+                leg.tibia.get_angle(exact[j + 2]),
+            )[3]
+            error = math.sqrt(
+                (tip.x - exact_tip.x) ** 2
+                + (tip.y - exact_tip.y) ** 2
+                + (tip.z - exact_tip.z) ** 2
+            )
+            if error > self.foot_error_max:
+                self.foot_error_max = error
+            self._foot_error_total += error
+            self._foot_error_samples += 1
+
+    def _move_feet(self, t: float):
+        """
+        Move the foot positions to phase t of the tripod gait. Alternating legs share
+        a phase, and the two tripods are half a cycle apart. This is walk_cycle in
+        scalar math, and the foot positions are moved in place rather than replaced.
+        """
+        velocity = self.current_velocity
+        scale = self.max_velocity * self.walk_cycle_time / 4
+        sx = velocity.x * scale
+        sy = velocity.y * scale
+        sz = velocity.z * scale
+        lift = self.step_height * 2
+        names = self._leg_names
+        for i in range(len(names)):
+            neutral = self.foot_frames[names[i]]
+            foot = self.foot_positions[names[i]]
+            leg_t = t if i % 2 == 0 else (t + 0.5) % 1
+            fx, fy, fz = neutral.x + sx, neutral.y + sy, neutral.z + sz
+            bx, by, bz = neutral.x - sx, neutral.y - sy, neutral.z - sz
+            if leg_t < 0.5:
+                s = leg_t * 2
+                foot.x = lerp(fx, bx, s)
+                foot.y = lerp(fy, by, s)
+                foot.z = lerp(fz, bz, s)
+            else:
+                s = (leg_t - 0.5) * 2
+                foot.x = quad_bez(bx, neutral.x, fx, s)
+                foot.y = quad_bez(by, neutral.y, fy, s)
+                foot.z = quad_bez(bz, neutral.z + lift, fz, s)
+
+    def _solve_targets(self, targets) -> int:
+        """
+        Solve the current foot positions into raw servo angles without allocating.
+        The body inverse is only rebuilt when the pose changes. A leg whose foot is
+        out of reach keeps its angles in targets.
+        return: Bit mask of the legs whose IK failed.
         """
-        pass
+        if self._inverse_of is not self.relative_position:
+            self._inverse = self.relative_position.inverted()
+            self._inverse_of = self.relative_position
+        m = self._inverse.m
+        names = self._leg_names
+        legs = self._leg_list
+        failures = 0
+        for i in range(len(legs)):
+            foot = self.foot_positions[names[i]]
+            x = m[0][0] * foot.x + m[0][1] * foot.y + m[0][2] * foot.z + m[0][3]
+            y = m[1][0] * foot.x + m[1][1] * foot.y + m[1][2] * foot.z + m[1][3]
+            z = m[2][0] * foot.x + m[2][1] * foot.y + m[2][2] * foot.z + m[2][3]
+            if not legs[i].solve_into(x, y, z, targets, i * 3):
+                failures |= 1 << i
+        return failures
+
+    def _write_targets(self, targets, skip: int):
+        """
+        Write raw servo angles to every leg through the joint limiter, if there is
+        one. Without a limiter, the legs in the skip bit mask aren't written.
+        return: The angles written, which are the limiter's own array with a limiter.
+        """
+        legs = self._leg_list
+        if self.joint_limiter is not None:
+            angles = self.joint_limiter.step(targets)
+            for i in range(len(legs)):
+                legs[i].write_angles(angles, i * 3)
+            return angles
+        for i in range(len(legs)):
+            if not skip & (1 << i):
+                legs[i].write_angles(targets, i * 3)
+        return targets
+
+    def _terrain_gait(self, t: float, stride: Vector):
+        """
+        The tripod gait over a height map. A stance foot stays on the ground at its
+        planted world position. A swing foot lifts off from the height it was planted
+        at, lands on the height of its next foothold, and clears the higher of the
+        two by the step height. All of the heights are found in one batch query.
+        """
+        half_cycle = self.walk_cycle_time / 2
+        speed = self.current_velocity * self.max_velocity
+        xs, ys = self._terrain_x, self._terrain_y
+        world = self.world_position
+
+        # Query 0 is under the body, then two for each leg.
+        xs[0], ys[0] = world.x, world.y
+        feet = []
+        for i, (name, neutral) in enumerate(self.foot_frames.items()):
+            leg_t = t if i % 2 == 0 else (t + 0.5) % 1
+            forward = neutral + stride
+            backward = neutral - stride
+            if leg_t < 0.5:
+                # Both queries are the foot itself, which doesn't move in the world.
+                backward = forward = lerp_3d(forward, backward, leg_t * 2)
+            else:
+                # Where the foot lifted off, and where it will land.
+                elapsed = (leg_t - 0.5) * 2 * half_cycle
+                backward = backward - speed * elapsed
+                forward = forward + speed * (half_cycle - elapsed)
+            xs[i * 2 + 1], ys[i * 2 + 1] = world.x + backward.x, world.y + backward.y
+            xs[i * 2 + 2], ys[i * 2 + 2] = world.x + forward.x, world.y + forward.y
+            feet.append((name, neutral, leg_t))
+
+        heights = self.terrain.heights_at(xs, ys, self._terrain_z)
+        ground = heights[0]
+        for i, (name, neutral, leg_t) in enumerate(feet):
+            backward = neutral - stride
+            forward = neutral + stride
+            backward.z = heights[i * 2 + 1] - ground
+            forward.z = heights[i * 2 + 2] - ground
+            if leg_t < 0.5:
+                foot = lerp_3d(forward, backward, leg_t * 2)
+                foot.z = backward.z
+            else:
+                apex = max(backward.z, forward.z) + self.step_height
+                foot = walk_cycle(
+                    leg_t, forward, backward, lift_point(backward, forward, apex)
+                )
+            self.foot_positions[name] = foot
+        self._solve_legs()
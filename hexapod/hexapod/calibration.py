@@ -0,0 +1,277 @@
+import json
+import math
+import struct
+from array import array
+
+# pin, sample and bucket counts, angle start and step, command start and bucket step
+TABLE_HEADER = "<BHHffff"
+TABLE_HEADER_SIZE = struct.calcsize(TABLE_HEADER)
+
+
+def _interpolate(xs: list[float], ys: list[float], x: float) -> float:
+    """Piecewise linear interpolation through sorted xs, extrapolating at the ends."""
+    i = 1
+    while i < len(xs) - 1 and xs[i] < x:
+        i += 1
+    t = (x - xs[i - 1]) / (xs[i] - xs[i - 1])
+    return ys[i - 1] + (ys[i] - ys[i - 1]) * t
+
+
+def _merge_dead_zones(points: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """
+    Sort the points by command angle and merge any commands which did not move the
+    joint, such as in a dead zone, into a single point at their mean command.
+    """
+    points = sorted(points)
+    merged = []
+    for command, angle in points:
+        if merged and merged[-1][1] == angle:
+            commands = merged[-1][2] + [command]
+            merged[-1] = (sum(commands) / len(commands), angle, commands)
+        else:
+            merged.append((command, angle, [command]))
+    return [(command, angle) for command, angle, _ in merged]
+
+
+def _increasing(xs: list[float], ys: list[float]):
+    """Get the pairs in order of increasing xs, which must already be monotonic."""
+    if xs[0] > xs[-1]:
+        return list(reversed(xs)), list(reversed(ys))
+    return xs, ys
+
+
+class CalibrationTable:
+    """
+    A measured mapping between kinematic joint angles and servo command angles. The
+    forward direction is sampled on an even grid of angles, so each lookup is a
+    constant time index and a single lerp no matter how many points were measured.
+    The inverse inverts the same lerp exactly, through an even grid of buckets over
+    the commands which each hold the first forward sample they overlap. A bucket is
+    never wider than the narrowest forward sample, so a lookup steps past at most
+    one more sample, and a round trip through both comes back to the same angle.
+    """
+
+    @staticmethod
+    def fit(
+        points: list[tuple[float, float]],
+        resolution: int = 19,
+        max_buckets: int = 128,
+    ):
+        """
+        Fit a table from measured points.
+
+        Arguments:
+            points -- (command angle, measured kinematic angle) pairs. The kinematic
+                      angle is the one used by the IK, so the table replaces both the
+                      zeroed angle offset and the inversion of the servo.
+            resolution -- The number of samples in the forward direction of the
+                          table.
+            max_buckets -- The most buckets of the inverse, which bounds the table
+                           size at 4 bytes for each sample and 2 for each bucket.
+
+        Raises:
+            ValueError: If there are too few points, the joint does not move
+                        consistently in one direction as the command increases,
+                        or the samples are too uneven for max_buckets.
+
+        Returns:
+            The new CalibrationTable.
+        """
+        points = _merge_dead_zones(points)
+        if len(points) < 2 or resolution < 2:
+            raise ValueError("Calibration needs at least 2 distinct points.")
+
+        commands = [command for command, _ in points]
+        angles = [angle for _, angle in points]
+        steps = [b - a for a, b in zip(angles, angles[1:])]
+        if not (all(s > 0 for s in steps) or all(s < 0 for s in steps)):
+            raise ValueError(f"Measured angles are not monotonic: {angles}")
+
+        table = CalibrationTable()
+        table.angle_start, table.angle_step, table.raw = table._sample(
+            *_increasing(angles, commands), resolution
+        )
+        if table.raw[0] > table.raw[-1]:
+            # Store the samples in order of increasing command, walking the angles
+            # backwards, so the buckets only ever step forwards.
+            table.raw = array("f", reversed(table.raw))
+            table.angle_start += table.angle_step * (resolution - 1)
+            table.angle_step = -table.angle_step
+
+        raw = table.raw
+        widths = [b - a for a, b in zip(raw, raw[1:])]
+        if min(widths) <= 0:
+            raise ValueError("Calibration commands are not strictly monotonic.")
+        count = math.ceil((raw[-1] - raw[0]) / min(widths))
+        if count > max_buckets:
+            raise ValueError(
+                f"Calibration needs {count} buckets, more than {max_buckets}, as "
+                "the joint moves too unevenly with the command."
+            )
+        table.raw_start = raw[0]
+        table.raw_step = (raw[-1] - raw[0]) / count
+        table.buckets = array("H")
+        i = 0
+        for bucket in range(count):
+            command = table.raw_start + table.raw_step * bucket
+            while i < resolution - 2 and raw[i + 1] <= command:
+                i += 1
+            table.buckets.append(i)
+        table._update_scale()
+        return table
+
+    @staticmethod
+    def from_bytes(blob: bytes, offset: int = 0):
+        """
+        Read a table packed by to_bytes.
+
+        Returns:
+            The pin number, the table and the offset after the table.
+        """
+        (
+            pin,
+            count,
+            bucket_count,
+            angle_start,
+            angle_step,
+            raw_start,
+            raw_step,
+        ) = struct.unpack_from(TABLE_HEADER, blob, offset)
+        offset += TABLE_HEADER_SIZE
+        table = CalibrationTable()
+        table.angle_start = angle_start
+        table.angle_step = angle_step
+        table.raw_start = raw_start
+        table.raw_step = raw_step
+        table.raw = array("f", struct.unpack_from("<%df" % count, blob, offset))
+        offset += count * 4
+        table.buckets = array(
+            "H", struct.unpack_from("<%dH" % bucket_count, blob, offset)
+        )
+        offset += bucket_count * 2
+        table._update_scale()
+        return pin, table, offset
+
+    def __init__(self):
+        self.angle_start = 0.0
+        self.angle_step = 1.0
+        self.raw = array("f")
+        self.raw_start = 0.0
+        self.raw_step = 1.0
+        self.buckets = array("H")
+
+    def to_raw(self, angle: float) -> float:
+        """Get the servo command angle for a kinematic joint angle."""
+        f = (angle - self.angle_start) * self._angle_scale
+        i = int(f)
+        if i < 0:
+            i = 0
+        elif i > self._raw_last:
+            i = self._raw_last
+        raw = self.raw
+        return raw[i] + (raw[i + 1] - raw[i]) * (f - i)
+
+    def to_angle(self, raw: float) -> float:
+        """Get the kinematic joint angle for a servo command angle, for FK."""
+        bucket = int((raw - self.raw_start) * self._raw_scale)
+        if bucket < 0:
+            bucket = 0
+        elif bucket > self._buckets_last:
+            bucket = self._buckets_last
+        values = self.raw
+        i = self.buckets[bucket]
+        while i < self._raw_last and values[i + 1] < raw:
+            i += 1
+        t = (raw - values[i]) / (values[i + 1] - values[i])
+        return self.angle_start + self.angle_step * (i + t)
+
+    def round_trip_error(self) -> float:
+        """
+        Get the largest error in degrees of an angle mapped to a command and back,
+        at and between every forward sample.
+        """
+        error = 0.0
+        for i in range(2 * len(self.raw) - 1):
+            angle = self.angle_start + self.angle_step * i / 2
+            error = max(error, abs(self.to_angle(self.to_raw(angle)) - angle))
+        return error
+
+    def to_bytes(self, pin: int) -> bytes:
+        """Pack the table for the servo on the given pin."""
+        count = len(self.raw)
+        bucket_count = len(self.buckets)
+        return (
+            struct.pack(
+                TABLE_HEADER,
+                pin,
+                count,
+                bucket_count,
+                self.angle_start,
+                self.angle_step,
+                self.raw_start,
+                self.raw_step,
+            )
+            + struct.pack("<%df" % count, *self.raw)
+            + struct.pack("<%dH" % bucket_count, *self.buckets)
+        )
+
+    def _sample(self, xs: list[float], ys: list[float], resolution: int):
+        start = xs[0]
+        step = (xs[-1] - xs[0]) / (resolution - 1)
+        values = array(
+            "f", [_interpolate(xs, ys, start + step * i) for i in range(resolution)]
+        )
+        return start, step, values
+
+    def _update_scale(self):
+        self._angle_scale = 1 / self.angle_step
+        self._raw_scale = 1 / self.raw_step
+        self._raw_last = len(self.raw) - 2
+        self._buckets_last = len(self.buckets) - 1
+
+
+def fit_tables(measurements: dict, resolution: int = 19) -> dict:
+    """
+    Fit a table for each servo.
+    param measurements: Measured (command angle, kinematic angle) points keyed by pin.
+    return: CalibrationTables keyed by pin.
+    """
+    return {
+        int(pin): CalibrationTable.fit(points, resolution)
+        for pin, points in measurements.items()
+    }
+
+
+def fit_file(source: str, destination: str, resolution: int = 19):
+    """
+    Fit tables from a JSON file of measured points keyed by pin, and save them in the
+    binary format loaded on the device.
+    """
+    with open(source) as f:
+        tables = fit_tables(json.load(f), resolution)
+    return save_tables(destination, tables)
+
+
+def save_tables(path: str, tables: dict):
+    blob = b"".join(table.to_bytes(pin) for pin, table in tables.items())
+    with open(path, "wb") as f:
+        f.write(blob)
+    return len(blob)
+
+
+def load_tables(path: str) -> dict:
+    with open(path, "rb") as f:
+        blob = f.read()
+    tables = {}
+    offset = 0
+    while offset < len(blob):
+        pin, table, offset = CalibrationTable.from_bytes(blob, offset)
+        tables[pin] = table
+    return tables
+
+
+def apply_tables(body, tables: dict):
+    """Set the calibration table on every servo of the body with a table for its pin."""
+    for leg in body.legs.values():
+        for servo in (leg.coxa, leg.femur, leg.tibia):
+            servo.calibration = tables.get(servo.pin_number)
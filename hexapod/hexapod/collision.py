@@ -0,0 +1,113 @@
+# Vectorized self collision checks between neighbouring legs, for vetting poses in
+# planning and gait sweeps on the PC. This needs numpy, so it is never imported on
+# the pico.
+
+import numpy as np
+
+# Capsule radius in mm of the coxa, femur and tibia segments.
+DEFAULT_RADII = (15, 12, 10)
+
+
+def body_joints(body) -> np.ndarray:
+    """
+    Get the FK joints of a Body's last commanded servo angles in the shape used by
+    leg_collisions. A BatchBody's forward_kinematics() can be used directly.
+
+    Returns:
+        (1, legs, 4, 3) mount, femur, tibia and tip positions in the body frame.
+    """
+    return np.array(
+        [
+            [
+                [
+                    joint.to_list()
+                    for joint in leg.forward_kinematics(*leg.get_joint_angles())
+                ]
+                for leg in body.legs.values()
+            ]
+        ]
+    )
+
+
+def segment_distance(p1, q1, p2, q2) -> np.ndarray:
+    """
+    Get the closest distance between two batches of segments, from p1 to q1 and from
+    p2 to q2. All of the inputs broadcast together with a last axis of 3. Either
+    segment may have zero length.
+    """
+    d1 = q1 - p1
+    d2 = q2 - p2
+    r = p1 - p2
+    a = np.einsum("...i,...i", d1, d1)
+    e = np.einsum("...i,...i", d2, d2)
+    f = np.einsum("...i,...i", d2, r)
+    c = np.einsum("...i,...i", d1, r)
+    b = np.einsum("...i,...i", d1, d2)
+    eps = 1e-9
+    point1 = a <= eps
+    point2 = e <= eps
+    safe_a = np.where(point1, 1, a)
+    safe_e = np.where(point2, 1, e)
+
+    # Closest point on the first segment's line to the second, unless parallel.
+    denom = a * e - b * b
+    s = np.where(
+        denom > eps, np.clip((b * f - c * e) / np.where(denom > eps, denom, 1), 0, 1), 0
+    )
+    t = (b * s + f) / safe_e
+
+    # Clamp t to the second segment and recompute s for the clamped end.
+    s = np.where(t < 0, np.clip(-c / safe_a, 0, 1), s)
+    s = np.where(t > 1, np.clip((b - c) / safe_a, 0, 1), s)
+    t = np.clip(t, 0, 1)
+
+    # Either segment may be a single point, such as a joint folded flat.
+    s = np.where(point2, np.clip(-c / safe_a, 0, 1), s)
+    t = np.where(point2, 0, t)
+    s = np.where(point1, 0, s)
+    t = np.where(point1, np.where(point2, 0, np.clip(f / safe_e, 0, 1)), t)
+
+    closest = (p1 + d1 * s[..., None]) - (p2 + d2 * t[..., None])
+    return np.sqrt(np.einsum("...i,...i", closest, closest))
+
+
+def leg_collisions(joints: np.ndarray, radii=DEFAULT_RADII) -> np.ndarray:
+    """
+    Check each leg against the next leg around the body for collisions between the
+    capsules of their segments. Legs are in the order Body assumes, right front and
+    clockwise around the body, so only neighbouring legs are ever checked.
+    param joints: (N, legs, 4, 3) FK joints of N poses, such as from
+                  BatchBody.forward_kinematics.
+    param radii: Capsule radius of the coxa, femur and tibia.
+    return: (N, legs) True where leg i collides with leg i + 1.
+    """
+    radii = np.asarray(radii, dtype=float)
+    starts = joints[:, :, :3]
+    ends = joints[:, :, 1:]
+    neighbour_starts = np.roll(starts, -1, axis=1)
+    neighbour_ends = np.roll(ends, -1, axis=1)
+
+    # Broadphase on each leg's bounding box grown by the largest radius.
+    margin = radii.max()
+    low = joints.min(axis=2) - margin
+    high = joints.max(axis=2) + margin
+    overlap = np.all(
+        (low <= np.roll(high, -1, axis=1)) & (np.roll(low, -1, axis=1) <= high),
+        axis=-1,
+    )
+    collisions = np.zeros(overlap.shape, dtype=bool)
+    if not overlap.any():
+        return collisions
+
+    # Every segment of a leg against every segment of its neighbour, but only for
+    # the pairs which passed the broadphase.
+    n, leg = np.nonzero(overlap)
+    distance = segment_distance(
+        starts[n, leg][:, :, None],
+        ends[n, leg][:, :, None],
+        neighbour_starts[n, leg][:, None, :],
+        neighbour_ends[n, leg][:, None, :],
+    )
+    clearance = radii[:, None] + radii[None, :]
+    collisions[n, leg] = np.any(distance < clearance, axis=(1, 2))
+    return collisions
@@ -0,0 +1,255 @@
+import json
+import struct
+
+from hexapod.geometry_3d import Rotation, Transform, Vector
+
+MAGIC = b"HXPD"
+VERSION = 1
+JOINTS = ("coxa", "femur", "tibia")
+SERVO_PINS = 18
+NAME_LENGTH = 16
+
+# Little endian with no padding so the layout is the same on the pico and the PC.
+# MicroPython has no struct.Struct, so the formats are kept as plain strings.
+# magic, version, leg count, body height, update period
+HEADER = "<4sBBff"
+# name, coxa, femur and tibia lengths
+LEG = "<%dsfff" % NAME_LENGTH
+# top 3 rows of a transform, row major
+MATRIX = "<12f"
+# name, pin, inverted, zeroed angle, positive limit, negative limit
+SERVO = "<8sBBfff"
+
+HEADER_SIZE = struct.calcsize(HEADER)
+LEG_SIZE = struct.calcsize(LEG)
+MATRIX_SIZE = struct.calcsize(MATRIX)
+SERVO_SIZE = struct.calcsize(SERVO)
+
+
+def load_description(path: str) -> dict:
+    """Read a robot description JSON file and validate it."""
+    with open(path) as f:
+        description = json.load(f)
+    validate_description(description)
+    return description
+
+
+def validate_description(description: dict):
+    """
+    Check a robot description before it is compiled, so a bad config is caught on the
+    PC rather than on boot.
+
+    Raises:
+        ValueError: If the description is incomplete or inconsistent.
+    """
+    legs = description.get("legs")
+    if not legs or len(legs) != 6:
+        raise ValueError("Description must have 6 legs.")
+
+    names = [leg.get("name", "") for leg in legs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Leg names must be unique: {names}")
+
+    pins = []
+    for leg in legs:
+        name = leg.get("name", "")
+        if not name or len(name.encode()) > NAME_LENGTH:
+            raise ValueError(f"Invalid leg name '{name}'.")
+        for key in ("coxa_len", "femur_len", "tibia_len"):
+            if _leg_value(description, leg, key) <= 0:
+                raise ValueError(f"{name} {key} must be positive.")
+        if "mount" not in leg:
+            raise ValueError(f"{name} is missing a mount.")
+        for joint in JOINTS:
+            servo = leg.get("servos", {}).get(joint)
+            if servo is None:
+                raise ValueError(f"{name} is missing a {joint} servo.")
+            for key in ("pin", "upper_limit", "lower_limit", "zeroed_angle"):
+                if key not in servo:
+                    raise ValueError(f"{name} {joint} servo is missing '{key}'.")
+            if not 0 <= servo["pin"] < SERVO_PINS:
+                raise ValueError(f"{name} {joint} pin {servo['pin']} out of range.")
+            pins.append(servo["pin"])
+
+    if len(set(pins)) != len(pins):
+        raise ValueError("Each servo must use a unique pin.")
+
+
+def compile_description(description: dict) -> bytes:
+    """
+    Compile a validated robot description into the binary blob loaded on the device.
+    Mount transforms, their inverses and the adjusted servo limits are all computed
+    here so the device never needs to build a Rotation.
+    """
+    validate_description(description)
+    body = description.get("body", {})
+    blob = bytearray(
+        struct.pack(
+            HEADER,
+            MAGIC,
+            VERSION,
+            len(description["legs"]),
+            body.get("height", 30),
+            body.get("update_frequency", 1 / 50),
+        )
+    )
+
+    for leg in description["legs"]:
+        mount = leg["mount"]
+        transform = Transform(
+            Vector(mount.get("x", 0), mount.get("y", 0), mount.get("z", 0)),
+            Rotation(0, 0, mount.get("rotation", 0)),
+        )
+        blob += struct.pack(
+            LEG,
+            leg["name"].encode(),
+            _leg_value(description, leg, "coxa_len"),
+            _leg_value(description, leg, "femur_len"),
+            _leg_value(description, leg, "tibia_len"),
+        )
+        blob += struct.pack(MATRIX, *_flatten(transform))
+        blob += struct.pack(MATRIX, *_flatten(transform.inverted()))
+
+        for joint in JOINTS:
+            servo = leg["servos"][joint]
+            pos_limit, neg_limit = _servo_limits(
+                servo["upper_limit"],
+                servo["lower_limit"],
+                servo["zeroed_angle"],
+                servo.get("inverted", False),
+            )
+            blob += struct.pack(
+                SERVO,
+                joint.capitalize().encode(),
+                servo["pin"],
+                servo.get("inverted", False),
+                servo["zeroed_angle"],
+                pos_limit,
+                neg_limit,
+            )
+
+    return bytes(blob)
+
+
+def compile_file(source: str, destination: str):
+    """Validate and compile a robot description JSON file to a binary blob file."""
+    blob = compile_description(load_description(source))
+    with open(destination, "wb") as f:
+        f.write(blob)
+    return len(blob)
+
+
+def compile_body(source: str, cluster, **body_kwargs):
+    """
+    Compile a robot description JSON file in memory and build the Body from it, for
+    tools on the PC. Nothing is written, so the robot.bin uploaded to the device is
+    only ever written by compile_file.
+    """
+    return load_body_blob(
+        compile_description(load_description(source)), cluster, **body_kwargs
+    )
+
+
+def load_body(path: str, cluster, **body_kwargs):
+    """
+    Load a compiled robot description and build the Body, Legs and Servos from it.
+    param path: Path to the compiled blob on the device.
+    param cluster: The servo cluster from Servo.create_cluster.
+    param body_kwargs: Any other Body arguments, such as max_velocity.
+    """
+    with open(path, "rb") as f:
+        blob = f.read()
+    return load_body_blob(blob, cluster, **body_kwargs)
+
+
+def load_body_blob(blob: bytes, cluster, **body_kwargs):
+    """Build the Body, Legs and Servos from a compiled blob, the same as load_body."""
+    # Imported here so the config can be compiled on a PC without the servo firmware.
+    from hexapod.body import Body
+    from hexapod.leg import Leg
+    from hexapod.servo import Servo
+
+    magic, version, leg_count, height, update_frequency = struct.unpack_from(
+        HEADER, blob, 0
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported config blob {magic} version {version}.")
+    offset = HEADER_SIZE
+
+    legs = {}
+    for _ in range(leg_count):
+        name, coxa_len, femur_len, tibia_len = struct.unpack_from(LEG, blob, offset)
+        offset += LEG_SIZE
+        mount = Transform.from_matrix(
+            _unflatten(struct.unpack_from(MATRIX, blob, offset))
+        )
+        offset += MATRIX_SIZE
+        inverse = Transform.from_matrix(
+            _unflatten(struct.unpack_from(MATRIX, blob, offset))
+        )
+        offset += MATRIX_SIZE
+
+        servos = []
+        for _ in JOINTS:
+            servo_name, pin, inverted, zeroed, pos_limit, neg_limit = (
+                struct.unpack_from(SERVO, blob, offset)
+            )
+            offset += SERVO_SIZE
+            servos.append(
+                Servo.from_limits(
+                    _decode(servo_name),
+                    cluster,
+                    pin,
+                    pos_limit,
+                    neg_limit,
+                    zeroed,
+                    bool(inverted),
+                )
+            )
+
+        name = _decode(name)
+        legs[name] = Leg(
+            name,
+            *servos,
+            mount,
+            coxa_len=coxa_len,
+            femur_len=femur_len,
+            tibia_len=tibia_len,
+            mount_inverse=inverse,
+        )
+
+    body_kwargs.setdefault("update_frequency", update_frequency)
+    return Body(legs, initial_position=Transform(Vector(0, 0, height)), **body_kwargs)
+
+
+def _leg_value(description: dict, leg: dict, key: str) -> float:
+    """Get a leg dimension, falling back to the shared leg dimensions."""
+    return leg.get(key, description.get("leg_dimensions", {}).get(key, 0))
+
+
+def _servo_limits(upper_limit, lower_limit, zeroed_angle, inverted):
+    """Adjust servo limits relative to the zeroed angle, the same as Servo does."""
+    if inverted:
+        upper_limit = -upper_limit + zeroed_angle
+        lower_limit = -lower_limit - zeroed_angle
+    else:
+        upper_limit = upper_limit - zeroed_angle
+        lower_limit = lower_limit + zeroed_angle
+    return max(upper_limit, lower_limit), min(upper_limit, lower_limit)
+
+
+def _flatten(transform: Transform) -> list[float]:
+    return [value for row in transform.m[:3] for value in row]
+
+
+def _unflatten(values) -> list[list[float]]:
+    return [
+        [values[0], values[1], values[2], values[3]],
+        [values[4], values[5], values[6], values[7]],
+        [values[8], values[9], values[10], values[11]],
+        [0, 0, 0, 1],
+    ]
+
+
+def _decode(name: bytes) -> str:
+    return name.decode().rstrip("\x00")
@@ -1,5 +1,7 @@
 import math
 
+IDENTITY_3X3 = ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+
 
 def matmult(a: list[list[float]], b: list[list[float]]) -> list[list[float]]:
     """
@@ -206,7 +208,11 @@ class Rotation:
         self.x = math.radians(x)
         self.y = math.radians(y)
         self.z = math.radians(z)
-        self.m = self._build_matrix()
+        if x or y or z:
+            self.m = self._build_matrix()
+        else:
+            # Skip the trig for the identity, such as in from_matrix.
+            self.m = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
 
     def _build_matrix(self):
         cos_x, sin_x = math.cos(self.x), math.sin(self.x)
@@ -254,6 +260,205 @@ class Rotation:
         return r2.transpose()
 
 
+class Quaternion:
+    """
+    A rotation as a unit quaternion. Composing two quaternions costs 16 multiplies
+    and no trig, and they can be interpolated smoothly without gimbal lock, so they
+    are cheaper than Rotation for orientations which change every tick.
+    """
+
+    @staticmethod
+    def from_euler(x: float = 0, y: float = 0, z: float = 0) -> "Quaternion":
+        """Create a quaternion from rotations in degrees, in the same order as Rotation.
+
+        Arguments:
+            x -- rotation about the x-axis in degrees
+            y -- rotation about the y axis in degrees
+            z -- rotation about the z axis in degrees
+        """
+        x, y, z = math.radians(x) / 2, math.radians(y) / 2, math.radians(z) / 2
+        cos_x, sin_x = math.cos(x), math.sin(x)
+        cos_y, sin_y = math.cos(y), math.sin(y)
+        cos_z, sin_z = math.cos(z), math.sin(z)
+        return Quaternion(
+            cos_x * cos_y * cos_z + sin_x * sin_y * sin_z,
+            sin_x * cos_y * cos_z - cos_x * sin_y * sin_z,
+            cos_x * sin_y * cos_z + sin_x * cos_y * sin_z,
+            cos_x * cos_y * sin_z - sin_x * sin_y * cos_z,
+        )
+
+    @staticmethod
+    def from_axis_angle(axis: Vector, angle: float) -> "Quaternion":
+        """Create a quaternion for a rotation in degrees about an axis."""
+        axis = axis.normalized()
+        half = math.radians(angle) / 2
+        sin_half = math.sin(half)
+        return Quaternion(
+            math.cos(half), axis.x * sin_half, axis.y * sin_half, axis.z * sin_half
+        )
+
+    @staticmethod
+    def from_rotation(rotation: Rotation) -> "Quaternion":
+        """Create a quaternion from the matrix of a Rotation without any trig."""
+        m = rotation.m
+        trace = m[0][0] + m[1][1] + m[2][2]
+        # Divide by the largest component to keep the result accurate.
+        if trace > 0:
+            s = math.sqrt(trace + 1) * 2
+            q = Quaternion(
+                s / 4,
+                (m[2][1] - m[1][2]) / s,
+                (m[0][2] - m[2][0]) / s,
+                (m[1][0] - m[0][1]) / s,
+            )
+        elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+            s = math.sqrt(1 + m[0][0] - m[1][1] - m[2][2]) * 2
+            q = Quaternion(
+                (m[2][1] - m[1][2]) / s,
+                s / 4,
+                (m[0][1] + m[1][0]) / s,
+                (m[0][2] + m[2][0]) / s,
+            )
+        elif m[1][1] > m[2][2]:
+            s = math.sqrt(1 + m[1][1] - m[0][0] - m[2][2]) * 2
+            q = Quaternion(
+                (m[0][2] - m[2][0]) / s,
+                (m[0][1] + m[1][0]) / s,
+                s / 4,
+                (m[1][2] + m[2][1]) / s,
+            )
+        else:
+            s = math.sqrt(1 + m[2][2] - m[0][0] - m[1][1]) * 2
+            q = Quaternion(
+                (m[1][0] - m[0][1]) / s,
+                (m[0][2] + m[2][0]) / s,
+                (m[1][2] + m[2][1]) / s,
+                s / 4,
+            )
+        return q.normalize()
+
+    @staticmethod
+    def nlerp(q1: "Quaternion", q2: "Quaternion", t: float) -> "Quaternion":
+        """
+        Normalized linear interpolation. Cheaper than slerp with a slightly uneven
+        angular speed, which is fine for small steps.
+        """
+        sign = -1 if q1.dot(q2) < 0 else 1
+        return Quaternion(
+            q1.w + (q2.w * sign - q1.w) * t,
+            q1.x + (q2.x * sign - q1.x) * t,
+            q1.y + (q2.y * sign - q1.y) * t,
+            q1.z + (q2.z * sign - q1.z) * t,
+        ).normalize()
+
+    @staticmethod
+    def slerp(q1: "Quaternion", q2: "Quaternion", t: float) -> "Quaternion":
+        """Spherical linear interpolation at a constant angular speed."""
+        return Quaternion.slerp_batch(q1, q2, [t])[0]
+
+    @staticmethod
+    def slerp_batch(
+        q1: "Quaternion", q2: "Quaternion", ts: list[float]
+    ) -> list["Quaternion"]:
+        """
+        Sample a slerp at many points, such as an orientation trajectory. The angle
+        between the quaternions is only found once, so each sample costs two sines.
+        """
+        dot = q1.dot(q2)
+        sign = 1
+        if dot < 0:
+            # Take the shorter way around.
+            dot, sign = -dot, -1
+        if dot > 0.9995:
+            return [Quaternion.nlerp(q1, q2, t) for t in ts]
+
+        theta = math.acos(dot)
+        inv_sin = 1 / math.sin(theta)
+        result = []
+        for t in ts:
+            a = math.sin((1 - t) * theta) * inv_sin
+            b = math.sin(t * theta) * inv_sin * sign
+            result.append(
+                Quaternion(
+                    q1.w * a + q2.w * b,
+                    q1.x * a + q2.x * b,
+                    q1.y * a + q2.y * b,
+                    q1.z * a + q2.z * b,
+                )
+            )
+        return result
+
+    def __init__(self, w: float = 1, x: float = 0, y: float = 0, z: float = 0):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __str__(self):
+        return "{}({:.4f}, {:.4f}, {:.4f}, {:.4f})".format(
+            self.__class__.__name__, self.w, self.x, self.y, self.z
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __mul__(self, other: "Quaternion") -> "Quaternion":
+        """Compose two rotations, applying other first and then this one."""
+        if not isinstance(other, Quaternion):
+            raise TypeError("Operand must be an instance of Quaternion")
+        return Quaternion(
+            self.w * other.w - self.x * other.x - self.y * other.y - self.z * other.z,
+            self.w * other.x + self.x * other.w + self.y * other.z - self.z * other.y,
+            self.w * other.y - self.x * other.z + self.y * other.w + self.z * other.x,
+            self.w * other.z + self.x * other.y - self.y * other.x + self.z * other.w,
+        )
+
+    def dot(self, other: "Quaternion") -> float:
+        return self.w * other.w + self.x * other.x + self.y * other.y + self.z * other.z
+
+    def normalize(self) -> "Quaternion":
+        """Normalize the quaternion in place to undo any drift from composing."""
+        length = math.sqrt(self.dot(self))
+        if length == 0:
+            raise ValueError("Cannot normalize a zero-length quaternion.")
+        self.w /= length
+        self.x /= length
+        self.y /= length
+        self.z /= length
+        return self
+
+    def conjugate(self) -> "Quaternion":
+        """Get the inverse rotation of a unit quaternion."""
+        return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+    def apply(self, point: Point) -> Point:
+        """Rotate a point about the origin."""
+        # v + 2w(u x v) + 2u x (u x v), where u is the vector part.
+        tx = 2 * (self.y * point.z - self.z * point.y)
+        ty = 2 * (self.z * point.x - self.x * point.z)
+        tz = 2 * (self.x * point.y - self.y * point.x)
+        return Point(
+            point.x + self.w * tx + self.y * tz - self.z * ty,
+            point.y + self.w * ty + self.z * tx - self.x * tz,
+            point.z + self.w * tz + self.x * ty - self.y * tx,
+        )
+
+    def to_rotation(self) -> Rotation:
+        """Get the equivalent Rotation without any trig."""
+        w, x, y, z = self.w, self.x, self.y, self.z
+        return Rotation.from_matrix(
+            [
+                [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+                [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+            ]
+        )
+
+    def to_transform(self, translation: Vector | None = None) -> "Transform":
+        """Get a Transform with this rotation and an optional translation."""
+        return Transform(translation, self.to_rotation())
+
+
 class Transform:
     """
     A 3D transformation matrix for translation and rotation which can
@@ -277,13 +482,14 @@ class Transform:
         rotation: Rotation | None = None,
     ):
         translation = translation or Vector(0, 0, 0)
-        rotation = rotation or Rotation(0, 0, 0)
+        # Skip building an identity Rotation, which would cost six trig calls.
+        r = IDENTITY_3X3 if rotation is None else rotation.m
 
         # Add translation
         self.m = [
-            [rotation.m[0][0], rotation.m[0][1], rotation.m[0][2], translation.x],
-            [rotation.m[1][0], rotation.m[1][1], rotation.m[1][2], translation.y],
-            [rotation.m[2][0], rotation.m[2][1], rotation.m[2][2], translation.z],
+            [r[0][0], r[0][1], r[0][2], translation.x],
+            [r[1][0], r[1][1], r[1][2], translation.y],
+            [r[2][0], r[2][1], r[2][2], translation.z],
             [0, 0, 0, 1],
         ]
 
@@ -298,7 +504,7 @@ class Transform:
         """Invert the transformation in place."""
         # Extract the rotation (upper-left 3x3) and translation (last column)
         rot_t = Transform(rotation=self.get_rotation().transpose())
-        translation = self.get_translation()
+        translation = self.get_vector()
 
         # Compute the inverted translation
         inverted_translation = rot_t.apply(translation * -1)
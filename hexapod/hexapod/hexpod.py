@@ -1,5 +1,3 @@
-# TODO: Import a JSON or other config for dimensions and parameters
-
 class Hexapod:
     def __init__(self):
         pass
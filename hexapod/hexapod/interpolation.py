@@ -35,7 +35,7 @@ def cubic_bez(
 ):
     if style == "decasteljau":
         return lerp(quad_bez(v1, v2, v3, t), quad_bez(v2, v3, v4, t), t)
-    elif "bernstein":
+    elif style == "bernstein":
         return (
             v1 * (-math.pow(t, 3) + (3 * math.pow(t, 2)) - (3 * t) + 1)
             + v2 * (3 * math.pow(t, 3) - (6 * math.pow(t, 2)) + (3 * t))
@@ -65,5 +65,28 @@ def cubic_bez_3d(
     )
 
 
+def cubic_hermite(p0: float, p1: float, m0: float, m1: float, t: float):
+    """
+    Interpolate from p0 to p1 along a cubic with the tangent m0 at p0 and m1 at p1,
+    both scaled to the whole interval.
+    """
+    t2 = t * t
+    t3 = t2 * t
+    return (
+        (2 * t3 - 3 * t2 + 1) * p0
+        + (t3 - 2 * t2 + t) * m0
+        + (3 * t2 - 2 * t3) * p1
+        + (t3 - t2) * m1
+    )
+
+
+def catmull_rom(v0: float, v1: float, v2: float, v3: float, t: float):
+    """
+    Interpolate from v1 to v2 along a cubic Hermite, with the tangents taken from
+    the values either side, so a series of evenly spaced values joins smoothly.
+    """
+    return cubic_hermite(v1, v2, (v2 - v0) / 2, (v3 - v1) / 2, t)
+
+
 def cosine_ease_t(t: float):
     return (1 - math.cos(t * math.pi)) / 2
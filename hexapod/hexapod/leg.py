@@ -16,15 +16,20 @@ class Leg:
         coxa_len=50,
         femur_len=50,
         tibia_len=50,
+        mount_inverse: Transform | None = None,
     ):
         """
         Initialize the leg with servo pin numbers for each joint (coxa, femur, tibia). Offsets
         specify the angle of the Pointinate plane relative to the body and ground plane when
-        the servo is zeroed out on a scale of -90 to 90.
+        the servo is zeroed out on a scale of -90 to 90. If the inverse of the mount offset
+        is already known, such as from a compiled config, it can be passed as mount_inverse.
         """
         self.name = name
 
-        self.mount_offset = mount_offset.invert()
+        self.mount_transform = mount_offset
+        self.mount_offset = (
+            mount_offset.inverted() if mount_inverse is None else mount_inverse
+        )
         self.pos_from_global = self.mount_offset
 
         self.coxa = coxa
@@ -35,13 +40,16 @@ class Leg:
         self.femur_len = femur_len
         self.tib_len = tibia_len
 
+        # Scratch IK angles, so solving doesn't allocate a new list each time.
+        self._ik_angles = [0.0, 0.0, 0.0]
+
     def change_global_position(self, transform: Transform):
         """
         Change the reference point of this leg with respect to the global Pointinate system.
         The leg already knows it's relative transform from the body center, but as the body
         moves, this function will update the body's transform relative to the global origin.
         """
-        self.pos_from_global = self.mount_offset.dot(transform.invert())
+        self.pos_from_global = self.mount_offset.dot(transform.inverted())
 
     def set_position(self, position: Point):
         """
@@ -57,12 +65,66 @@ class Leg:
         angles = self._calculate_ik(position)
         return self._set_servo_angles(*angles)
 
+    def set_body_position(self, position: Point):
+        """
+        Set a position for the leg tip in the body's coordinate system. The body is
+        expected to have already applied its own inverse transform, so only the
+        mount offset is applied here.
+        """
+        if self.enabled == False:
+            return
+
+        return self._set_servo_angles(*self.solve(position))
+
+    def solve(self, position: Point):
+        """Get the IK angles for a leg tip position in the body's coordinate system."""
+        return self._calculate_ik(self.mount_offset.apply(position))
+
+    def get_servo_angles(self, position: Point):
+        """Get the raw servo angles for a leg tip position in the body's coordinate system."""
+        a1, a2, a3 = self.solve(position)
+        return (
+            self.coxa.get_raw_angle(a1),
+            self.femur.get_raw_angle(a2),
+            self.tibia.get_raw_angle(a3),
+        )
+
     def set_angles(self, s1, s2, s3):
         if self.enabled == False:
             return
-        self.coxa.set_angle(s1)
-        self.femur.set_angle(s2)
-        self.tibia.set_angle(s3)
+        return (
+            self.coxa.set_angle(s1),
+            self.femur.set_angle(s2),
+            self.tibia.set_angle(s3),
+        )
+
+    def solve_into(self, x: float, y: float, z: float, out, index: int) -> bool:
+        """
+        Solve a leg tip position in the body's coordinate system into raw servo
+        angles without allocating any objects, for the body's update ticks.
+        param out: Array the coxa, femur and tibia angles are written to.
+        param index: Index in out of the coxa angle.
+        return: False if the position is out of reach, leaving out unchanged.
+        """
+        m = self.mount_offset.m
+        lx = m[0][0] * x + m[0][1] * y + m[0][2] * z + m[0][3]
+        ly = m[1][0] * x + m[1][1] * y + m[1][2] * z + m[1][3]
+        lz = m[2][0] * x + m[2][1] * y + m[2][2] * z + m[2][3]
+        angles = self._ik_angles
+        if not self._calculate_ik_into(lx, ly, lz, angles):
+            return False
+        out[index] = self.coxa.get_raw_angle(angles[0])
+        out[index + 1] = self.femur.get_raw_angle(angles[1])
+        out[index + 2] = self.tibia.get_raw_angle(angles[2])
+        return True
+
+    def write_angles(self, angles, index: int):
+        """Set the servos from raw angles in an array, without building a tuple."""
+        if self.enabled == False:
+            return
+        self.coxa.set_angle(angles[index])
+        self.femur.set_angle(angles[index + 1])
+        self.tibia.set_angle(angles[index + 2])
 
     def enable(self):
         self.enabled = True
@@ -83,26 +145,68 @@ class Leg:
         Calculates the angles from the leg hip joint to the tip point in 3d space,
         with x axis being parallel to the ground plane, perpindicular to the mount point.
         """
-        a1 = math.degrees(math.atan2(position.y, position.x))
+        angles = self._ik_angles
+        if not self._calculate_ik_into(position.x, position.y, position.z, angles):
+            raise ValueError(f"{position} is out of reach of the femur and tibia.")
+        return (angles[0], angles[1], angles[2])
 
-        xyH = max(0, math.sqrt(position.y**2 + position.x**2) - self.coxa_len)
-        zH = math.sqrt(position.z**2 + xyH**2)
-        if (self.femur_len + self.tib_len) <= zH:
-            raise ValueError(f"Reach distance {zH} exceeds femur + tibia length.")
-        z_theta = math.atan2(position.z, xyH)
+    def _calculate_ik_into(self, x: float, y: float, z: float, out) -> bool:
+        """
+        The IK of _calculate_ik on scalars, writing the angles into out so nothing is
+        allocated. Returns False if the position is out of reach.
+        """
+        xyH = max(0, math.sqrt(y**2 + x**2) - self.coxa_len)
+        zH = math.sqrt(z**2 + xyH**2)
+        if zH == 0 or (self.femur_len + self.tib_len) <= zH:
+            return False
         a2cos = (self.femur_len**2 + zH**2 - self.tib_len**2) / (
             2 * self.femur_len * zH
         )
-        a2 = math.degrees(math.acos(a2cos) + z_theta)
+        a3cos = (self.femur_len**2 + self.tib_len**2 - zH**2) / (
+            2 * self.tib_len * self.femur_len
+        )
+        # Too close to the coxa joint for the femur and tibia to fold to.
+        if a2cos > 1 or a2cos < -1 or a3cos > 1 or a3cos < -1:
+            return False
 
-        a3 = math.degrees(
-            math.acos(
-                (self.femur_len**2 + self.tib_len**2 - zH**2)
-                / (2 * self.tib_len * self.femur_len)
-            )
+        out[0] = math.degrees(math.atan2(y, x))
+        out[1] = math.degrees(math.acos(a2cos) + math.atan2(z, xyH))
+        out[2] = math.degrees(math.acos(a3cos))
+        return True
+
+    def get_joint_angles(self):
+        """Get the IK angles of the last commanded servo positions."""
+        return (
+            self.coxa.get_angle(self.coxa.angle),
+            self.femur.get_angle(self.femur.angle),
+            self.tibia.get_angle(self.tibia.angle),
         )
 
-        return (a1, a2, a3)
+    def forward_kinematics(self, a1, a2, a3) -> list[Point]:
+        """
+        Get the joint positions for a set of IK angles in the body's coordinate system,
+        the inverse of _calculate_ik.
+
+        Returns:
+            The mount, femur joint, tibia joint and tip Points.
+        """
+        a1 = math.radians(a1)
+        femur_angle = math.radians(a2)
+        tibia_angle = femur_angle + math.radians(a3) - math.pi
+        cos_a1, sin_a1 = math.cos(a1), math.sin(a1)
+
+        reach = self.coxa_len
+        height = 0
+        joints = [Point(0, 0, 0), Point(reach * cos_a1, reach * sin_a1, 0)]
+        for length, angle in (
+            (self.femur_len, femur_angle),
+            (self.tib_len, tibia_angle),
+        ):
+            reach += length * math.cos(angle)
+            height += length * math.sin(angle)
+            joints.append(Point(reach * cos_a1, reach * sin_a1, height))
+
+        return [self.mount_transform.apply(joint) for joint in joints]
 
     def _clamp(self, value, min_val, max_val):
         """Ensures the servo stays within it's calibrated limits."""
@@ -0,0 +1,223 @@
+# Streaming 3D view of the hexapod for the PC. This needs matplotlib, so it is never
+# imported on the pico.
+
+import json
+import os
+from collections import deque
+
+import matplotlib
+
+from hexapod.geometry_3d import Transform
+
+
+def record_frame(body, t: float) -> dict:
+    """
+    Capture the state needed to draw a body, so it can be streamed or logged as a
+    JSON line. The joint angles come from the last commanded servo angles, so the
+    view shows what was actually sent rather than the IK targets.
+    """
+    angles = []
+    for leg in body.legs.values():
+        angles.extend(leg.get_joint_angles())
+    return {
+        "t": t,
+        "pose": [value for row in body.relative_position.m[:3] for value in row],
+        "angles": angles,
+    }
+
+
+def write_log(path: str, frames):
+    """Write frames to a JSON lines log as they are produced, and pass them on."""
+    with open(path, "w") as f:
+        for frame in frames:
+            f.write(json.dumps(frame) + "\n")
+            yield frame
+
+
+def read_log(path: str):
+    """Stream frames from a JSON lines log without loading the whole file."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def frame_points(body, frame: dict) -> dict:
+    """
+    Get the FK joint positions of every leg in the ground frame.
+
+    Returns:
+        (x, y, z) lists of the mount, femur, tibia and tip keyed by leg name.
+    """
+    p = frame["pose"]
+    pose = Transform.from_matrix(
+        [p[0:4], p[4:8], p[8:12], [0, 0, 0, 1]],
+    )
+    angles = frame["angles"]
+    points = {}
+    for i, (name, leg) in enumerate(body.legs.items()):
+        joints = leg.forward_kinematics(*angles[i * 3 : i * 3 + 3])
+        joints = [pose.apply(joint) for joint in joints]
+        points[name] = (
+            [joint.x for joint in joints],
+            [joint.y for joint in joints],
+            [joint.z for joint in joints],
+        )
+    return points
+
+
+class DecimatedTrail:
+    """
+    A fixed size history of points. The most recent points are kept at full rate,
+    and older points are thinned by half each time they fill up, so the cost of
+    drawing the trail stays the same no matter how long the run is.
+    """
+
+    def __init__(self, recent: int = 50, history: int = 200):
+        self.recent = deque()
+        self.recent_size = recent
+        self.history = []
+        self.history_size = history
+        self.stride = 1
+        self._evicted = 0
+
+    def append(self, point: tuple[float, float, float]):
+        self.recent.append(point)
+        if len(self.recent) <= self.recent_size:
+            return
+
+        point = self.recent.popleft()
+        self._evicted += 1
+        if self._evicted % self.stride == 0:
+            self.history.append(point)
+            if len(self.history) > self.history_size:
+                self.history = self.history[::2]
+                self.stride *= 2
+
+    def coordinates(self):
+        """Get the (x, y, z) lists of the whole trail, oldest first."""
+        points = self.history + list(self.recent)
+        if not points:
+            return [], [], []
+        x, y, z = zip(*points)
+        return list(x), list(y), list(z)
+
+
+class LiveView:
+    """
+    Draws the body and legs for each frame of a stream with blitted line artists.
+    When headless, frames are rendered to image files instead of a window.
+    """
+
+    def __init__(
+        self,
+        body,
+        limit: float = 300,
+        recent: int = 50,
+        history: int = 200,
+        headless_dir: str | None = None,
+        save_every: int = 1,
+    ):
+        """
+        param body: The Body used for the FK of each frame's joint angles.
+        param limit: Half the width of the fixed view in mm. The axes can't rescale
+                     while blitting, so it should cover the whole run.
+        param recent: Number of foot trail points kept at full rate.
+        param history: Number of decimated older foot trail points.
+        param headless_dir: If set, render every save_every frame to a png in this
+                            directory rather than opening a window.
+        """
+        if headless_dir is not None:
+            matplotlib.use("Agg")
+            os.makedirs(headless_dir, exist_ok=True)
+        import matplotlib.pyplot as plt
+
+        self.plt = plt
+        self.body = body
+        # Animated artists are left out of a normal draw, which savefig relies on.
+        animated = headless_dir is None
+        self.headless_dir = headless_dir
+        self.save_every = save_every
+        self.frame_count = 0
+
+        self.fig = plt.figure()
+        self.ax = self.fig.add_subplot(111, projection="3d")
+        self.ax.set_xlim(-limit, limit)
+        self.ax.set_ylim(-limit, limit)
+        self.ax.set_zlim(-limit / 4, limit * 3 / 4)
+        self.ax.set_xlabel("X")
+        self.ax.set_ylabel("Y")
+        self.ax.set_zlabel("Z")
+        self.ax.set_autoscale_on(False)
+
+        (self.body_line,) = self.ax.plot([], [], [], color="red", animated=animated)
+        self.leg_lines = {}
+        self.trail_lines = {}
+        self.trails = {}
+        for name in body.legs:
+            (line,) = self.ax.plot(
+                [], [], [], marker="o", label=name, animated=animated
+            )
+            (trail,) = self.ax.plot(
+                [], [], [], color=line.get_color(), alpha=0.4, animated=animated
+            )
+            self.leg_lines[name] = line
+            self.trail_lines[name] = trail
+            self.trails[name] = DecimatedTrail(recent, history)
+        self.title = self.ax.text2D(
+            0.02, 0.95, "", transform=self.ax.transAxes, animated=animated
+        )
+        self.ax.legend(loc="upper right", fontsize="small")
+
+        self.background = None
+        if headless_dir is None:
+            plt.show(block=False)
+            plt.pause(0.1)
+            self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+
+    def draw(self, frame: dict):
+        """Update the artists for a frame and draw it."""
+        points = frame_points(self.body, frame)
+        mounts = list(points.values())
+        self.body_line.set_data_3d(
+            [xyz[0][0] for xyz in mounts] + [mounts[0][0][0]],
+            [xyz[1][0] for xyz in mounts] + [mounts[0][1][0]],
+            [xyz[2][0] for xyz in mounts] + [mounts[0][2][0]],
+        )
+        for name, (x, y, z) in points.items():
+            self.leg_lines[name].set_data_3d(x, y, z)
+            trail = self.trails[name]
+            trail.append((x[-1], y[-1], z[-1]))
+            self.trail_lines[name].set_data_3d(*trail.coordinates())
+        self.title.set_text(f"t = {frame['t']:.2f}s")
+
+        self.frame_count += 1
+        if self.headless_dir is not None:
+            if self.frame_count % self.save_every == 0:
+                self.fig.savefig(
+                    os.path.join(self.headless_dir, f"frame_{self.frame_count:06d}.png")
+                )
+            return
+
+        self.fig.canvas.restore_region(self.background)
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+        self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.flush_events()
+
+    def run(self, frames):
+        """Draw every frame of a live stream or a log as it arrives."""
+        for frame in frames:
+            if self.headless_dir is None and not self.plt.fignum_exists(
+                self.fig.number
+            ):
+                break
+            self.draw(frame)
+
+    def _artists(self):
+        return [
+            self.body_line,
+            self.title,
+            *self.leg_lines.values(),
+            *self.trail_lines.values(),
+        ]
@@ -0,0 +1,120 @@
+import math
+from array import array
+
+
+class JointLimiter:
+    """
+    A motion profiling stage between the IK and the servo output. Each joint follows
+    its target with a trapezoidal velocity profile, accelerating and braking within
+    its acceleration limit and never exceeding its velocity limit. All of the state
+    is preallocated, so stepping the limiter does not allocate any new arrays.
+    """
+
+    def __init__(
+        self,
+        period: float | None = None,
+        max_velocity: float = 360,
+        max_acceleration: float = 3600,
+        joint_count: int = 18,
+    ):
+        """
+        param period: Time in seconds between each step. A Body sets this to its own
+                      update_frequency, since it steps the limiter once per tick.
+        param max_velocity: Max joint speed in degrees/s for every joint.
+        param max_acceleration: Max joint acceleration in degrees/s^2 for every joint.
+        param joint_count: The number of joints, coxa, femur and tibia for each leg.
+        """
+        self.period = period
+        self.max_velocity = array("f", [max_velocity] * joint_count)
+        self.max_acceleration = array("f", [max_acceleration] * joint_count)
+        self.position = array("f", [0] * joint_count)
+        self.velocity = array("f", [0] * joint_count)
+        self.initialized = False
+
+    def set_limits(self, joint: int, max_velocity: float, max_acceleration: float):
+        """Override the limits of a single joint, such as a heavily loaded femur."""
+        self.max_velocity[joint] = max_velocity
+        self.max_acceleration[joint] = max_acceleration
+
+    def reset(self, angles):
+        """
+        Set the current joint angles with zero velocity. The servo positions can't be
+        read back, so the first step will jump straight to its targets unless this is
+        called with a known pose first.
+        """
+        for i in range(len(self.position)):
+            self.position[i] = angles[i]
+            self.velocity[i] = 0
+        self.initialized = True
+
+    def settled(self, targets, tolerance: float = 0.01) -> bool:
+        """Check whether every joint has stopped at its target, within tolerance."""
+        for i in range(len(self.position)):
+            if (
+                abs(targets[i] - self.position[i]) > tolerance
+                or abs(self.velocity[i]) > tolerance
+            ):
+                return False
+        return self.initialized
+
+    def step(self, targets) -> array:
+        """
+        Move every joint one period towards its target.
+        param targets: The servo command angles from the IK, one per joint.
+        return: The limited angles to send to the servos. This is the limiter's own
+                position array, so it is overwritten by the next step.
+        """
+        if not self.initialized:
+            self.reset(targets)
+            return self.position
+
+        dt = self.period
+        position = self.position
+        velocity = self.velocity
+        for i in range(len(position)):
+            error = targets[i] - position[i]
+            max_acceleration = self.max_acceleration[i]
+            dv_max = max_acceleration * dt
+
+            # Aim to reach the target this step, but no faster than the joint can
+            # still brake to a stop at the target. The position moves a whole
+            # period at each velocity, so braking from v over n + 1 steps, each
+            # dv_max slower, covers dt * (n + 1) * (v - n * dv_max / 2). This is
+            # solved for v, after finding the n whole steps the error allows.
+            steps = int(math.sqrt(0.25 + 2 * abs(error) / (dv_max * dt)) - 0.5)
+            speed = min(
+                self.max_velocity[i],
+                abs(error) / (dt * (steps + 1)) + steps * dv_max / 2,
+            )
+            desired = min(max(error / dt, -speed), speed)
+            v = velocity[i]
+            if desired > v + dv_max:
+                v += dv_max
+            elif desired < v - dv_max:
+                v -= dv_max
+            else:
+                v = desired
+
+            # Never step past the target while moving towards it, so a target on
+            # a servo limit can't be overshot.
+            if (v > 0 and v * dt >= error >= 0) or (v < 0 and v * dt <= error <= 0):
+                position[i] = targets[i]
+                velocity[i] = error / dt
+            else:
+                position[i] += v * dt
+                velocity[i] = v
+        return position
+
+    def worst_case_current(
+        self, idle_current: float, current_per_velocity: float
+    ) -> float:
+        """
+        Estimate the peak current draw of all the joints moving at their limits, which
+        the supply has to be sized for.
+        param idle_current: Amps drawn by a servo holding position under load.
+        param current_per_velocity: Additional amps per degree/s of joint speed.
+        """
+        return sum(
+            idle_current + current_per_velocity * self.max_velocity[i]
+            for i in range(len(self.max_velocity))
+        )
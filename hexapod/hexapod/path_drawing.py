@@ -1,5 +1,5 @@
 from hexapod.interpolation import lerp_3d, quad_bez_3d
-from hexapod.utils import Point
+from hexapod.geometry_3d import Point
 import math
 
 
@@ -14,6 +14,18 @@ def walk_cycle(
         return quad_bez_3d(backward_point, lift_point, forward_point, t)
 
 
+def lift_point(backward_point: Point, forward_point: Point, apex: float):
+    """
+    Get the walk_cycle lift point for a swing which peaks at the apex height
+    halfway between the backward and forward points.
+    """
+    return Point(
+        (backward_point.x + forward_point.x) / 2,
+        (backward_point.y + forward_point.y) / 2,
+        2 * apex - (backward_point.z + forward_point.z) / 2,
+    )
+
+
 def circle_pattern(t, center_point):
     x = center_point[0] + 50 * math.cos(t)
     y = center_point[1] + 50 * math.sin(t)
@@ -0,0 +1,306 @@
+import heapq
+import math
+
+from hexapod.geometry_3d import Point, Rotation, Transform, Vector
+
+# Lattice directions for 16 headings, counter clockwise from +x. Each one is the
+# smallest whole cell step along its heading, so every move lands on a cell.
+DIRECTIONS = (
+    (1, 0),
+    (2, 1),
+    (1, 1),
+    (1, 2),
+    (0, 1),
+    (-1, 2),
+    (-1, 1),
+    (-2, 1),
+    (-1, 0),
+    (-2, -1),
+    (-1, -1),
+    (-1, -2),
+    (0, -1),
+    (1, -2),
+    (1, -1),
+    (2, -1),
+)
+HEADING_ANGLES = tuple(math.degrees(math.atan2(dy, dx)) for dx, dy in DIRECTIONS)
+
+
+class ObstacleGrid:
+    """An occupancy grid of the floor. Anything outside of the grid is blocked."""
+
+    def __init__(
+        self,
+        cells: list[list[int]],
+        cell_size: float = 50,
+        origin_x: float = 0,
+        origin_y: float = 0,
+    ):
+        """
+        param cells: Rows along y of columns along x, truthy where blocked.
+        param cell_size: Width of each cell in mm.
+        param origin_x: World x of the center of the first column.
+        param origin_y: World y of the center of the first row.
+        """
+        self.rows = len(cells)
+        self.columns = len(cells[0])
+        self.blocked_cells = bytearray(
+            1 if blocked else 0 for row in cells for blocked in row
+        )
+        self.cell_size = cell_size
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+
+    def blocked(self, column: int, row: int) -> bool:
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            return True
+        return self.blocked_cells[row * self.columns + column] == 1
+
+    def to_cell(self, x: float, y: float) -> tuple[int, int]:
+        return (
+            round((x - self.origin_x) / self.cell_size),
+            round((y - self.origin_y) / self.cell_size),
+        )
+
+    def to_world(self, column: int, row: int) -> tuple[float, float]:
+        return (
+            self.origin_x + column * self.cell_size,
+            self.origin_y + row * self.cell_size,
+        )
+
+
+class FootstepPlanner:
+    """
+    A* over a lattice of body poses: grid cells and one of 16 headings. A pose is
+    free when the body footprint and every foothold land on free cells. The cell
+    offsets of the footprint and footholds are precomputed once per heading, and
+    the free check of each pose is cached, so both are shared by every query on the
+    same grid. When only the goal moves, the previous search is resumed rather than
+    started over.
+    """
+
+    @staticmethod
+    def from_body(grid: ObstacleGrid, body, **kwargs) -> "FootstepPlanner":
+        """Create a planner using the mount footprint and neutral footholds of a Body."""
+        mounts = [leg.mount_transform.get_vector() for leg in body.legs.values()]
+        length = max(abs(mount.x) for mount in mounts) * 2
+        width = max(abs(mount.y) for mount in mounts) * 2
+        footholds = [foot.copy() for foot in body.foot_frames.values()]
+        return FootstepPlanner(grid, length, width, footholds, **kwargs)
+
+    def __init__(
+        self,
+        grid: ObstacleGrid,
+        length: float,
+        width: float,
+        footholds: list[Point],
+        turn_cost: float | None = None,
+        reverse_cost: float = 2,
+    ):
+        """
+        param grid: The obstacle grid to plan over.
+        param length: Length of the body footprint along its heading in mm.
+        param width: Width of the body footprint in mm.
+        param footholds: Neutral foot positions relative to the body center in mm.
+        param turn_cost: Cost in mm of turning in place by one heading. Defaults to
+                         one cell.
+        param reverse_cost: Cost multiplier for walking backwards.
+        """
+        self.grid = grid
+        self.turn_cost = grid.cell_size if turn_cost is None else turn_cost
+        self.reverse_cost = reverse_cost
+
+        self.footprints = []
+        self.footholds = []
+        self.moves = []
+        for heading in range(len(DIRECTIONS)):
+            self.footprints.append(self._footprint(heading, length, width))
+            self.footholds.append(self._footholds(heading, footholds))
+            self.moves.append(self._moves(heading))
+
+        # Pad the grid with blocked cells by the furthest offset, so each pose can
+        # be checked with flat indexes and no bounds checks.
+        self._pad = max(
+            max(abs(dx), abs(dy))
+            for heading in range(len(DIRECTIONS))
+            for dx, dy in self._cell_offsets(heading)
+        )
+        self._stride = grid.columns + self._pad * 2
+        self._cells = bytearray([1]) * (self._stride * (grid.rows + self._pad * 2))
+        for row in range(grid.rows):
+            start = (row + self._pad) * self._stride + self._pad
+            self._cells[start : start + grid.columns] = grid.blocked_cells[
+                row * grid.columns : (row + 1) * grid.columns
+            ]
+        self._offsets = [
+            tuple(dy * self._stride + dx for dx, dy in self._cell_offsets(heading))
+            for heading in range(len(DIRECTIONS))
+        ]
+
+        self._free = {}
+        self._search = None
+
+    def plan(self, start: tuple[float, float, float], goal: tuple[float, float, float]):
+        """
+        Plan a route of body poses between two poses.
+        param start: World x, y in mm and heading in degrees of the start.
+        param goal: World x, y in mm and heading in degrees of the goal.
+        return: A list of (pose Transform, foothold Points) for each step of the
+                route, or None if the goal can't be reached.
+        """
+        start_state = self._to_state(*start)
+        goal_state = self._to_state(*goal)
+        if not self._is_free(goal_state):
+            return None
+
+        search = self._search
+        if search is None or search["start"] != start_state:
+            if not self._is_free(start_state):
+                return None
+            search = {
+                "start": start_state,
+                "g": {start_state: 0},
+                "parent": {start_state: None},
+                "closed": set(),
+                "open": [],
+            }
+            heapq.heappush(search["open"], (0, 0, 0, start_state))
+            self._search = search
+        else:
+            # The costs from the start are still right, so only the open list needs
+            # to be ordered for the new goal.
+            search["open"] = [
+                (g + self._heuristic(state, goal_state), -g, g, state)
+                for _, _, g, state in search["open"]
+            ]
+            heapq.heapify(search["open"])
+
+        if goal_state in search["closed"] or self._expand(search, goal_state):
+            return self._route(search, goal_state)
+        return None
+
+    def _expand(self, search: dict, goal: tuple[int, int, int]) -> bool:
+        g_costs = search["g"]
+        parent = search["parent"]
+        closed = search["closed"]
+        open_list = search["open"]
+        while open_list:
+            _, _, g, state = heapq.heappop(open_list)
+            if state in closed or g > g_costs[state]:
+                continue
+            closed.add(state)
+            if state == goal:
+                return True
+
+            column, row, heading = state
+            for dx, dy, next_heading, cost in self.moves[heading]:
+                next_state = (column + dx, row + dy, next_heading)
+                next_g = g + cost
+                if next_state in closed or next_g >= g_costs.get(next_state, math.inf):
+                    continue
+                if not self._is_free(next_state):
+                    continue
+                g_costs[next_state] = next_g
+                parent[next_state] = state
+                # Break ties towards the deeper pose to expand fewer poses.
+                f = next_g + self._heuristic(next_state, goal)
+                heapq.heappush(open_list, (f, -next_g, next_g, next_state))
+        return False
+
+    def _route(self, search: dict, goal: tuple[int, int, int]):
+        states = []
+        state = goal
+        while state is not None:
+            states.append(state)
+            state = search["parent"][state]
+        states.reverse()
+
+        route = []
+        for column, row, heading in states:
+            x, y = self.grid.to_world(column, row)
+            angle = HEADING_ANGLES[heading]
+            pose = Transform(Vector(x, y, 0), Rotation(0, 0, angle))
+            footholds = [
+                Point(x + foot_x, y + foot_y, 0)
+                for foot_x, foot_y, _, _ in self.footholds[heading]
+            ]
+            route.append((pose, footholds))
+        return route
+
+    def _heuristic(self, state: tuple[int, int, int], goal: tuple[int, int, int]):
+        return math.hypot(state[0] - goal[0], state[1] - goal[1]) * self.grid.cell_size
+
+    def _is_free(self, state: tuple[int, int, int]) -> bool:
+        free = self._free.get(state)
+        if free is None:
+            column, row, heading = state
+            if 0 <= column < self.grid.columns and 0 <= row < self.grid.rows:
+                base = (row + self._pad) * self._stride + column + self._pad
+                cells = self._cells
+                free = not any(
+                    cells[base + offset] for offset in self._offsets[heading]
+                )
+            else:
+                free = False
+            self._free[state] = free
+        return free
+
+    def _cell_offsets(self, heading: int):
+        """Get the cell offsets of the footprint and footholds at a heading."""
+        return set(self.footprints[heading]) | {
+            (dx, dy) for _, _, dx, dy in self.footholds[heading]
+        }
+
+    def _to_state(self, x: float, y: float, heading: float) -> tuple[int, int, int]:
+        column, row = self.grid.to_cell(x, y)
+        # The nearest lattice heading, wrapping the angle difference to +-180.
+        nearest = min(
+            range(len(DIRECTIONS)),
+            key=lambda i: abs((HEADING_ANGLES[i] - heading + 180) % 360 - 180),
+        )
+        return (column, row, nearest)
+
+    def _footprint(self, heading: int, length: float, width: float):
+        """Get the cell offsets covered by the body rectangle at a heading."""
+        angle = math.radians(HEADING_ANGLES[heading])
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        size = self.grid.cell_size
+        cells = set()
+        # Sample at half a cell so no covered cell is missed.
+        steps_x = max(1, math.ceil(length / size * 2))
+        steps_y = max(1, math.ceil(width / size * 2))
+        for i in range(steps_x + 1):
+            for j in range(steps_y + 1):
+                x = -length / 2 + length * i / steps_x
+                y = -width / 2 + width * j / steps_y
+                cells.add(
+                    (
+                        round((x * cos_a - y * sin_a) / size),
+                        round((x * sin_a + y * cos_a) / size),
+                    )
+                )
+        return tuple(cells)
+
+    def _footholds(self, heading: int, footholds: list[Point]):
+        """Get the world offsets and cell offsets of each foothold at a heading."""
+        angle = math.radians(HEADING_ANGLES[heading])
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        size = self.grid.cell_size
+        offsets = []
+        for foot in footholds:
+            x = foot.x * cos_a - foot.y * sin_a
+            y = foot.x * sin_a + foot.y * cos_a
+            offsets.append((x, y, round(x / size), round(y / size)))
+        return tuple(offsets)
+
+    def _moves(self, heading: int):
+        """Get the (dx, dy, heading, cost) moves from a heading."""
+        count = len(DIRECTIONS)
+        dx, dy = DIRECTIONS[heading]
+        step = math.hypot(dx, dy) * self.grid.cell_size
+        return (
+            (dx, dy, heading, step),
+            (-dx, -dy, heading, step * self.reverse_cost),
+            (0, 0, (heading + 1) % count, self.turn_cost),
+            (0, 0, (heading - 1) % count, self.turn_cost),
+        )
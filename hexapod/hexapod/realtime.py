@@ -0,0 +1,191 @@
+import gc
+
+from hexapod.timing import sleep_us, ticks_add, ticks_diff, ticks_us
+
+# Heap stats only exist on MicroPython.
+_mem_alloc = getattr(gc, "mem_alloc", None)
+_mem_free = getattr(gc, "mem_free", None)
+
+
+class RealtimeLoop:
+    """
+    Runs the update ticks of a Body at a fixed rate with automatic garbage collection
+    disabled, so a collection can never pause a tick part way through. The heap is
+    only collected in the idle slack after a tick, when the slowest collection so
+    far still fits before the next tick, or when the heap is about to run out. The
+    body's ticks allocate no objects, except over terrain, but floats are still
+    boxed on the pico, so the heap does grow slowly.
+    """
+
+    def __init__(self, body, margin_us: int = 200, min_free: int = 8192):
+        """
+        param body: The Body to update.
+        param margin_us: Slack to leave after a collection before the next tick.
+        param min_free: Collect regardless of the slack below this many free bytes.
+        """
+        self.body = body
+        self.period_us = int(body.update_frequency * 1000000)
+        self.margin_us = margin_us
+        self.min_free = min_free
+
+        # The last tick.
+        self.tick_us = 0
+        self.gc_us = 0
+        self.heap = 0
+
+        self.ticks = 0
+        self.overruns = 0
+        self.collections = 0
+        self.forced_collections = 0
+        self.max_tick_us = 0
+        self.max_gc_us = 0
+        self.total_gc_us = 0
+        self.heap_high_water = 0
+
+    def run(self, stop):
+        """
+        Update the body every period until stop returns True, such as a button's raw.
+        Automatic collection is turned back on when the loop ends.
+        """
+        gc.collect()
+        gc.disable()
+        try:
+            deadline = ticks_us()
+            while not stop():
+                self.step()
+                deadline = ticks_add(deadline, self.period_us)
+                remaining = ticks_diff(deadline, ticks_us())
+                if remaining > 0:
+                    sleep_us(remaining)
+                else:
+                    # Late, so start the next period now rather than catch up.
+                    self.overruns += 1
+                    deadline = ticks_us()
+        finally:
+            gc.enable()
+
+    def step(self):
+        """Update the body once, then collect if there is time left in the period."""
+        start = ticks_us()
+        self.body.update()
+        self.tick_us = ticks_diff(ticks_us(), start)
+        if self.tick_us > self.max_tick_us:
+            self.max_tick_us = self.tick_us
+        self.ticks += 1
+
+        # Nothing is freed while collection is off, so the heap peaks right before
+        # each collection.
+        if _mem_alloc is not None:
+            self.heap = _mem_alloc()
+            if self.heap > self.heap_high_water:
+                self.heap_high_water = self.heap
+
+        forced = _mem_free is not None and _mem_free() < self.min_free
+        slack = self.period_us - self.tick_us
+        self.gc_us = 0
+        if forced or slack > self.max_gc_us + self.margin_us:
+            gc_start = ticks_us()
+            gc.collect()
+            self.gc_us = ticks_diff(ticks_us(), gc_start)
+            self.collections += 1
+            if forced:
+                self.forced_collections += 1
+            self.total_gc_us += self.gc_us
+            if self.gc_us > self.max_gc_us:
+                self.max_gc_us = self.gc_us
+
+    def stats(self) -> dict:
+        """Get the tick and collection times, and the heap high water mark in bytes."""
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "max_tick_us": self.max_tick_us,
+            "collections": self.collections,
+            "forced_collections": self.forced_collections,
+            "max_gc_us": self.max_gc_us,
+            "gc_us_per_tick": self.total_gc_us // self.ticks if self.ticks else 0,
+            "heap_high_water": self.heap_high_water,
+        }
+
+
+# Values which are boxed on the pico too, so they aren't counted as allocations.
+_SCALARS = (bool, int, float, str, type(None))
+
+
+def _keep_objects(kept: list, package: str):
+    """
+    Get a trace function which keeps every object returned or bound to a local by
+    code in the package folder, so nothing it allocates is freed while it's measured.
+    """
+
+    def trace_line(frame, event, arg):
+        if event == "return":
+            if not isinstance(arg, _SCALARS):
+                kept.append(arg)
+            for value in frame.f_locals.values():
+                if not isinstance(value, _SCALARS):
+                    kept.append(value)
+        return trace_line
+
+    def trace_call(frame, event, arg):
+        if frame.f_code.co_filename.startswith(package):
+            return trace_line
+        return None
+
+    return trace_call
+
+
+def measure_allocations(body, ticks: int = 50, warmup: int = 300) -> dict:
+    """
+    Find every line of the hexapod package which allocates an object during a
+    body's update ticks, with tracemalloc on CPython. Objects are freed as soon as
+    they're dropped on CPython, so every object returned or bound to a local is kept
+    until the end, and then shows up in a snapshot at the line which allocated it.
+    Floats and ints are boxed on the pico as well, so they aren't counted, and an
+    object which is only ever on the stack, such as a list literal passed straight
+    to a builtin, is missed.
+
+    Returns:
+        The allocation sites as "file:line" with the objects allocated there per
+        tick, which is empty when the ticks allocate nothing.
+    """
+    import os
+    import sys
+    import tracemalloc
+
+    for _ in range(warmup):
+        body.update()
+    kept = []
+    tracemalloc.start()
+    sys.settrace(_keep_objects(kept, os.path.dirname(__file__)))
+    try:
+        # One traced tick first, so any caches it fills aren't counted.
+        body.update()
+        # A full collection also empties the free lists CPython keeps its spare
+        # tuples and floats in, which would otherwise be counted.
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        for _ in range(ticks):
+            body.update()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        sys.settrace(None)
+        tracemalloc.stop()
+
+    filters = [
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ]
+    float_size = sys.getsizeof(0.0)
+    sites = {}
+    for stat in after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    ):
+        # Floats stored in place of the last ones free them again, but the line
+        # that allocates them can change between the snapshots.
+        if stat.count_diff <= 0 or stat.size_diff == stat.count_diff * float_size:
+            continue
+        frame = stat.traceback[0]
+        sites[f"{frame.filename}:{frame.lineno}"] = stat.count_diff / ticks
+    return {"ticks": ticks, "sites": sites}
@@ -0,0 +1,291 @@
+import json
+import struct
+from array import array
+
+from hexapod.geometry_3d import Point, Quaternion, Transform, Vector
+from hexapod.interpolation import cosine_ease_t, lerp_3d
+
+MAGIC = b"HXSQ"
+VERSION = 1
+NAME_LENGTH = 16
+
+# Little endian with no padding, the same as the compiled config.
+# magic, version, sequence count
+HEADER = "<4sBB"
+# name, frame count, joint count, frame period in seconds
+SEQUENCE = "<%dsHBf" % NAME_LENGTH
+# final body pose as the top 3 rows of a transform, row major
+POSE = "<12f"
+
+HEADER_SIZE = struct.calcsize(HEADER)
+SEQUENCE_SIZE = struct.calcsize(SEQUENCE)
+POSE_SIZE = struct.calcsize(POSE)
+
+# Servo angles are stored in hundredths of a degree.
+ANGLE_SCALE = 100
+# How far in degrees a servo command may be past a limit before it's an error.
+LIMIT_TOLERANCE = 0.01
+
+
+class Sequence:
+    """
+    A scripted move compiled to raw servo angles for every frame, such as standing
+    up. Playing it back is only servo writes, with no IK at all, and every frame was
+    checked to be reachable and within the servo limits when it was compiled.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        period: float,
+        joint_count: int,
+        angles: array,
+        pose: Transform,
+        feet: list[Point],
+    ):
+        """
+        param period: Time in seconds between each frame.
+        param joint_count: Servo angles in each frame, 3 per leg in the body order.
+        param angles: Raw servo angles of every frame in hundredths of a degree.
+        param pose: The body pose relative to the ground frame at the end.
+        param feet: The foot positions in the ground frame at the end.
+        """
+        self.name = name
+        self.period = period
+        self.joint_count = joint_count
+        self.angles = angles
+        self.pose = pose
+        self.feet = feet
+
+    def __len__(self):
+        return len(self.angles) // self.joint_count
+
+    def write_frame(self, legs: list, frame: int):
+        """Write the servo angles of a frame to every enabled leg."""
+        angles = self.angles
+        i = frame * self.joint_count
+        for leg in legs:
+            if leg.enabled:
+                leg.coxa.set_angle(angles[i] / ANGLE_SCALE)
+                leg.femur.set_angle(angles[i + 1] / ANGLE_SCALE)
+                leg.tibia.set_angle(angles[i + 2] / ANGLE_SCALE)
+            i += 3
+
+    def frame_angles(self, frame: int, out):
+        """Get the raw servo angles of a frame in degrees, written into out."""
+        start = frame * self.joint_count
+        for i in range(self.joint_count):
+            out[i] = self.angles[start + i] / ANGLE_SCALE
+        return out
+
+    def to_bytes(self) -> bytes:
+        blob = bytearray(
+            struct.pack(
+                SEQUENCE, self.name.encode(), len(self), self.joint_count, self.period
+            )
+        )
+        blob += struct.pack(POSE, *[value for row in self.pose.m[:3] for value in row])
+        blob += struct.pack(
+            "<%df" % self.joint_count,
+            *[value for foot in self.feet for value in foot.to_list()],
+        )
+        blob += self.angles.tobytes()
+        return bytes(blob)
+
+
+def compile_sequence(body, name: str, keyframes: list[dict]) -> Sequence:
+    """
+    Compile a Cartesian keyframe script for a body into a Sequence.
+
+    Arguments:
+        body -- The Body the sequence is for, with any calibration tables applied,
+                since they change the raw servo angles.
+        name -- The sequence name.
+        keyframes -- The keyframes in order. Each one may have:
+            duration -- Seconds to move from the previous keyframe. The first
+                        keyframe is the start, which the body's joint limiter
+                        moves the servos into, or which is written straight
+                        away when homing or without a limiter.
+            ease -- "cosine" (the default) or "linear".
+            body -- Any of x, y, z in mm and roll, pitch, yaw in degrees for the
+                    body pose relative to the ground frame.
+            feet -- Offsets in mm from the neutral foot positions, as x, y, z and
+                    reach outwards from the body center, for leg names, or "all",
+                    "even" or "odd" for both tripods.
+            Anything left out stays as it was in the previous keyframe. The body
+            starts from its initial height and the feet from neutral.
+
+    Raises:
+        ValueError: If any frame is out of reach or outside a servo limit.
+
+    Returns:
+        The compiled Sequence.
+    """
+    if len(name.encode()) > NAME_LENGTH:
+        raise ValueError(f"Sequence name '{name}' is too long.")
+    if not keyframes:
+        raise ValueError(f"Sequence {name} has no keyframes.")
+
+    period = body.update_frequency
+    legs = list(body.legs.values())
+    names = list(body.legs)
+    start = body.relative_position.get_vector()
+    state = {
+        "body": {"x": start.x, "y": start.y, "z": start.z},
+        "feet": {leg: {"x": 0, "y": 0, "z": 0} for leg in names},
+    }
+
+    angles = array("h")
+    previous = None
+    for index, keyframe in enumerate(keyframes):
+        state = _keyframe_state(state, keyframe, names, name, index)
+        translation, orientation, feet = _keyframe_pose(body, state)
+        if previous is None:
+            ts = [1]
+        else:
+            steps = max(1, round(keyframe.get("duration", 0) / period))
+            ts = [(i + 1) / steps for i in range(steps)]
+            ease = keyframe.get("ease", "cosine")
+            if ease == "cosine":
+                ts = [cosine_ease_t(t) for t in ts]
+            elif ease != "linear":
+                raise ValueError(f"Sequence {name} keyframe {index} ease '{ease}'.")
+
+        start_translation, start_orientation, start_feet = previous or (
+            translation,
+            orientation,
+            feet,
+        )
+        orientations = Quaternion.slerp_batch(start_orientation, orientation, ts)
+        for t, q in zip(ts, orientations):
+            pose = Transform(
+                lerp_3d(start_translation, translation, t), q.to_rotation()
+            )
+            frame_feet = [lerp_3d(a, b, t) for a, b in zip(start_feet, feet)]
+            _append_frame(angles, pose, frame_feet, legs, name, index)
+        previous = (translation, orientation, feet)
+
+    translation, orientation, feet = previous
+    return Sequence(
+        name,
+        period,
+        len(legs) * 3,
+        angles,
+        Transform(Vector.from_point(translation), orientation.to_rotation()),
+        feet,
+    )
+
+
+def compile_sequences(body, script: dict) -> bytes:
+    """Compile every sequence of a script, keyed by sequence name, into a blob."""
+    blob = bytearray(struct.pack(HEADER, MAGIC, VERSION, len(script)))
+    for name, keyframes in script.items():
+        blob += compile_sequence(body, name, keyframes).to_bytes()
+    return bytes(blob)
+
+
+def compile_sequence_file(body, source: str, destination: str) -> int:
+    """Compile a JSON sequence script file into the blob loaded by load_sequences."""
+    with open(source) as f:
+        script = json.load(f)
+    blob = compile_sequences(body, script)
+    with open(destination, "wb") as f:
+        f.write(blob)
+    return len(blob)
+
+
+def load_sequences(path: str) -> dict[str, Sequence]:
+    """Load compiled sequences, keyed by name."""
+    sequences = {}
+    with open(path, "rb") as f:
+        magic, version, count = struct.unpack(HEADER, f.read(HEADER_SIZE))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported sequence blob {magic} version {version}.")
+        for _ in range(count):
+            name, frames, joints, period = struct.unpack(
+                SEQUENCE, f.read(SEQUENCE_SIZE)
+            )
+            values = struct.unpack(POSE, f.read(POSE_SIZE))
+            pose = Transform.from_matrix(
+                [
+                    list(values[0:4]),
+                    list(values[4:8]),
+                    list(values[8:12]),
+                    [0, 0, 0, 1],
+                ]
+            )
+            values = struct.unpack("<%df" % joints, f.read(joints * 4))
+            feet = [Point(*values[i : i + 3]) for i in range(0, joints, 3)]
+            # Read straight into the array, which works the same on MicroPython.
+            angles = array("h", [0] * (frames * joints))
+            f.readinto(angles)
+            name = name.decode().rstrip("\x00")
+            sequences[name] = Sequence(name, period, joints, angles, pose, feet)
+    return sequences
+
+
+def _keyframe_state(
+    state: dict, keyframe: dict, names: list[str], sequence: str, index: int
+) -> dict:
+    """Apply a keyframe's changes to the body and feet of the previous keyframe."""
+    body = dict(state["body"])
+    body.update(keyframe.get("body", {}))
+    feet = {leg: dict(offset) for leg, offset in state["feet"].items()}
+    for key, offset in keyframe.get("feet", {}).items():
+        if key == "all":
+            selected = names
+        elif key in ("even", "odd"):
+            # The tripods, the same as the tripod gait.
+            selected = names[0 if key == "even" else 1 :: 2]
+        elif key in feet:
+            selected = [key]
+        else:
+            raise ValueError(
+                f"Sequence {sequence} keyframe {index} has no leg '{key}'."
+            )
+        for leg in selected:
+            feet[leg].update(offset)
+    return {"body": body, "feet": feet}
+
+
+def _keyframe_pose(body, state: dict):
+    """Get the translation, orientation and ground frame feet of a keyframe state."""
+    pose = state["body"]
+    translation = Point(pose.get("x", 0), pose.get("y", 0), pose.get("z", 0))
+    orientation = Quaternion.from_euler(
+        pose.get("roll", 0), pose.get("pitch", 0), pose.get("yaw", 0)
+    )
+    feet = []
+    for leg, neutral in body.foot_frames.items():
+        offset = state["feet"][leg]
+        # Reach is outwards from the body center, to spread or tuck in the feet.
+        outward = Vector(neutral.x, neutral.y, 0).normalize() * offset.get("reach", 0)
+        feet.append(
+            neutral
+            + outward
+            + Vector(offset.get("x", 0), offset.get("y", 0), offset.get("z", 0))
+        )
+    return translation, orientation, feet
+
+
+def _append_frame(
+    angles: array, pose: Transform, feet, legs, sequence: str, index: int
+):
+    """Solve a frame and check every joint against its servo limits."""
+    inverse = pose.inverted()
+    for leg, foot in zip(legs, feet):
+        try:
+            joint_angles = leg.solve(inverse.apply(foot))
+        except ValueError as e:
+            raise ValueError(f"Sequence {sequence} keyframe {index}: {leg.name} {e}")
+        for servo, angle in zip((leg.coxa, leg.femur, leg.tibia), joint_angles):
+            raw = servo.get_unclamped_raw_angle(angle)
+            if (
+                raw < servo.neg_limit - LIMIT_TOLERANCE
+                or raw > servo.pos_limit + LIMIT_TOLERANCE
+            ):
+                raise ValueError(
+                    f"Sequence {sequence} keyframe {index}: "
+                    f"{leg.get_servo_name(servo)} angle {angle:.1f} is outside of its servo limits."
+                )
+            angles.append(round(servo.get_raw_angle(angle) * ANGLE_SCALE))
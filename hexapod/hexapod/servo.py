@@ -6,6 +6,24 @@ class Servo:
     def create_cluster(pin_numbers:list):
         return RawCluster(0, 0, pin_numbers)
 
+    @staticmethod
+    def from_limits(name:str, cluster:RawCluster, pin_number:int, pos_limit:float, neg_limit:float, zeroed_angle:float, inverted = False):
+        """
+        Create a servo from limits which have already been adjusted for the zeroed angle
+        and inversion, such as those stored in a compiled config.
+        """
+        servo = Servo.__new__(Servo)
+        servo.name = name
+        servo.pin_number = pin_number
+        servo.cluster = cluster
+        servo.zeroed_angle = zeroed_angle
+        servo.inverted = inverted
+        servo.pos_limit = pos_limit
+        servo.neg_limit = neg_limit
+        servo.calibration = None
+        servo.angle = 0
+        return servo
+
     def __init__(self, name:str, cluster:RawCluster, pin_number:int, upper_limit:int, lower_limit:int, zeroed_angle:int, inverted = False):
         """
         Configuration for a servo motor.
@@ -36,24 +54,56 @@ class Servo:
         self.pos_limit = max(upper_limit, lower_limit)
         self.neg_limit = min(upper_limit, lower_limit)
 
+        # Optional CalibrationTable which replaces the linear mapping when set.
+        self.calibration = None
+        # Last commanded raw angle, since the servo position can't be read back.
+        self.angle = 0
+
     def set_angle(self, angle):
+        self.angle = angle
         return self.cluster.value(self.pin_number, angle)
 
     def get_raw_angle(self, desired_angle):
         """
         Convert a body-relative angle to the actual servo command angle.
 
+        :param desired_angle: The target angle relative to the body.
+        :return: The raw servo angle, clamped to the servo limits.
+        """
+        return self._clamp(self.get_unclamped_raw_angle(desired_angle))
+
+    def get_unclamped_raw_angle(self, desired_angle):
+        """
+        Convert a body-relative angle to the servo command angle without clamping it,
+        to check it against the limits.
+
         :param desired_angle: The target angle relative to the body.
         :return: The raw servo angle.
         """
+        if self.calibration is not None:
+            return self.calibration.to_raw(desired_angle)
         # Offset the desired angle by the zeroed angle (since it's the real position of the servo when at 0)
         if self.inverted:
             # Inverted servo: subtract the desired angle from the zeroed angle
-            return self._clamp(self.zeroed_angle - desired_angle)
+            return self.zeroed_angle - desired_angle
         else:
             # Non-inverted servo: add the desired angle to the zeroed angle
-            return self._clamp(desired_angle - self.zeroed_angle)
+            return desired_angle - self.zeroed_angle
     
+    def get_angle(self, raw_angle):
+        """
+        Convert a servo command angle back to the body-relative angle, for FK.
+
+        :param raw_angle: The servo command angle.
+        :return: The angle relative to the body.
+        """
+        if self.calibration is not None:
+            return self.calibration.to_angle(raw_angle)
+        if self.inverted:
+            return self.zeroed_angle - raw_angle
+        else:
+            return raw_angle + self.zeroed_angle
+
     def _clamp(self, value):
         """
         Clamp the value to the servo motor limits.
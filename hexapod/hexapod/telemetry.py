@@ -0,0 +1,167 @@
+import struct
+import _thread
+from array import array
+
+from hexapod.timing import sleep_ms, ticks_diff, ticks_us
+
+# tick, time in us, tick duration in us, IK failure bit per leg, 18 servo angles in
+# hundredths of a degree. Both the pico and the PC are little endian, so the angles
+# are written straight into the int16 words of the buffer.
+RECORD = "<IIHH18h"
+RECORD_SIZE = struct.calcsize(RECORD)
+RECORD_WORDS = RECORD_SIZE // 2
+ANGLE_WORD = 6
+
+
+class TelemetryRing:
+    """
+    A preallocated ring buffer of fixed size binary records. The control loop writes
+    one record per tick straight into the buffer, and a drain ships whole batches
+    to a file or socket, so recording allocates no new buffers. There is one writer
+    and one reader, and the writer drops records rather than overwrite ones which
+    have not been drained yet.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.buffer = array("h", [0] * (capacity * RECORD_WORDS))
+        self.view = memoryview(self.buffer)
+        # Total records written and drained. Only the writer moves head and only
+        # the drain moves tail.
+        self.head = 0
+        self.tail = 0
+
+        self.dropped = 0
+        self.max_record_us = 0
+        self.drained_bytes = 0
+        self.drain_us = 0
+        self.running = False
+
+    def record(self, tick: int, duration_us: int, failures: int, legs: list):
+        """
+        Write a record of the commanded servo angles of every leg.
+        param tick: The control loop tick count.
+        param duration_us: How long the tick took to compute.
+        param failures: Bit mask of legs whose IK failed this tick.
+        param legs: The body's legs, in order. A list rather than the legs dict, as
+                    iterating a dict view allocates on MicroPython.
+        """
+        start = ticks_us()
+        if self.head - self.tail >= self.capacity:
+            self.dropped += 1
+            return
+
+        slot = self.head % self.capacity
+        struct.pack_into(
+            "<IIHH",
+            self.buffer,
+            slot * RECORD_SIZE,
+            tick,
+            start & 0xFFFFFFFF,
+            min(duration_us, 0xFFFF),
+            failures,
+        )
+        word = slot * RECORD_WORDS + ANGLE_WORD
+        buffer = self.buffer
+        for leg in legs:
+            buffer[word] = round(leg.coxa.angle * 100)
+            buffer[word + 1] = round(leg.femur.angle * 100)
+            buffer[word + 2] = round(leg.tibia.angle * 100)
+            word += 3
+        self.head += 1
+
+        elapsed = ticks_diff(ticks_us(), start)
+        if elapsed > self.max_record_us:
+            self.max_record_us = elapsed
+
+    def drain(self, sink, batch: int = 32) -> int:
+        """
+        Send waiting records to a sink in contiguous batches.
+        param sink: Called with a memoryview of whole records, such as file.write.
+        param batch: Max records per call, to keep UDP datagrams small.
+        return: The number of records drained.
+        """
+        start = ticks_us()
+        drained = 0
+        while self.tail < self.head:
+            slot = self.tail % self.capacity
+            count = min(self.head - self.tail, self.capacity - slot, batch)
+            sink(self.view[slot * RECORD_WORDS : (slot + count) * RECORD_WORDS])
+            self.tail += count
+            drained += count
+        self.drained_bytes += drained * RECORD_SIZE
+        self.drain_us += ticks_diff(ticks_us(), start)
+        return drained
+
+    def start_drain(self, sink, period_ms: int = 100, batch: int = 32):
+        """Drain in a background thread, on the second core of the pico."""
+        self.running = True
+
+        def run():
+            while self.running:
+                self.drain(sink, batch)
+                sleep_ms(period_ms)
+
+        _thread.start_new_thread(run, ())
+
+    def stop_drain(self):
+        self.running = False
+
+    def stats(self) -> dict:
+        """Get the drain throughput and the worst case time added to a tick."""
+        return {
+            "records": self.head,
+            "dropped": self.dropped,
+            "drained_bytes": self.drained_bytes,
+            "drain_bytes_per_s": (
+                self.drained_bytes * 1000000 // self.drain_us if self.drain_us else 0
+            ),
+            "max_record_us": self.max_record_us,
+        }
+
+
+def file_sink(path: str):
+    """Get a sink which appends records to a file."""
+    f = open(path, "ab")
+
+    def write(records):
+        f.write(records)
+        f.flush()
+
+    return write
+
+
+def udp_sink(host: str = "127.0.0.1", port: int = 5005):
+    """Get a sink which sends each batch of records as a UDP datagram."""
+    # Imported here since the servo2040 firmware has no network stack.
+    import socket
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = socket.getaddrinfo(host, port)[0][-1]
+
+    def send(records):
+        sock.sendto(records, address)
+
+    return send
+
+
+def decode(data: bytes):
+    """
+    Decode a batch of records.
+
+    Returns:
+        A dict for each record with the angles in degrees.
+    """
+    records = []
+    for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        values = struct.unpack_from(RECORD, data, offset)
+        records.append(
+            {
+                "tick": values[0],
+                "time_us": values[1],
+                "duration_us": values[2],
+                "failures": values[3],
+                "angles": [angle / 100 for angle in values[4:]],
+            }
+        )
+    return records
@@ -0,0 +1,112 @@
+import struct
+from array import array
+
+try:
+    import mmap
+except ImportError:
+    # MicroPython has no mmap, so cells are read from the file as needed.
+    mmap = None
+
+MAGIC = b"HXHM"
+# magic, columns, rows, world x and y of the first cell, cell size in mm
+HEADER = "<4sHHfff"
+HEADER_SIZE = struct.calcsize(HEADER)
+
+
+def write_heightmap(
+    path: str,
+    heights: list[list[float]],
+    origin_x: float = 0,
+    origin_y: float = 0,
+    cell_size: float = 10,
+):
+    """
+    Save a height grid in the format read by HeightMap.
+    param heights: Heights in mm as rows along y of columns along x.
+    param origin_x: World x of the first column.
+    param origin_y: World y of the first row.
+    param cell_size: Distance in mm between grid points.
+    """
+    rows = len(heights)
+    columns = len(heights[0])
+    with open(path, "wb") as f:
+        f.write(
+            struct.pack(HEADER, MAGIC, columns, rows, origin_x, origin_y, cell_size)
+        )
+        for row in heights:
+            if len(row) != columns:
+                raise ValueError(
+                    "Every row of the height grid must be the same length."
+                )
+            f.write(array("f", row).tobytes())
+
+
+class HeightMap:
+    """
+    A grid of ground heights read from a file. On the PC the file is memory mapped,
+    and on the pico only the cells around each query are read, so a large map is
+    never loaded into RAM. Heights between grid points are bilinear, and each query
+    costs the same no matter the size of the map.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        magic, columns, rows, origin_x, origin_y, cell_size = struct.unpack(
+            HEADER, self.file.read(HEADER_SIZE)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a height map.")
+        self.columns = columns
+        self.rows = rows
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.cell_size = cell_size
+        self._scale = 1 / cell_size
+
+        if mmap is not None:
+            self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._grid = memoryview(self._map)[HEADER_SIZE:].cast("f")
+        else:
+            self._grid = None
+            self._cell = array("f", [0, 0])
+
+    def close(self):
+        if self._grid is not None:
+            self._grid.release()
+            self._map.close()
+        self.file.close()
+
+    def height_at(self, x: float, y: float) -> float:
+        """Get the bilinear ground height at a world position, clamped to the map."""
+        fx = (x - self.origin_x) * self._scale
+        fy = (y - self.origin_y) * self._scale
+        column = min(max(int(fx), 0), self.columns - 2)
+        row = min(max(int(fy), 0), self.rows - 2)
+        tx = min(max(fx - column, 0), 1)
+        ty = min(max(fy - row, 0), 1)
+
+        h00, h10 = self._pair(column, row)
+        h01, h11 = self._pair(column, row + 1)
+        bottom = h00 + (h10 - h00) * tx
+        top = h01 + (h11 - h01) * tx
+        return bottom + (top - bottom) * ty
+
+    def heights_at(self, xs, ys, out):
+        """
+        Get the heights of a batch of world positions, such as every foothold.
+        param xs: World x of each position.
+        param ys: World y of each position.
+        param out: Preallocated array the heights are written to.
+        """
+        for i in range(len(xs)):
+            out[i] = self.height_at(xs[i], ys[i])
+        return out
+
+    def _pair(self, column: int, row: int):
+        """Get the heights of a cell and its neighbour along x."""
+        index = row * self.columns + column
+        if self._grid is not None:
+            return self._grid[index], self._grid[index + 1]
+        self.file.seek(HEADER_SIZE + index * 4)
+        self.file.readinto(self._cell)
+        return self._cell[0], self._cell[1]
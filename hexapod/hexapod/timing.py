@@ -0,0 +1,22 @@
+# The MicroPython clock and sleeps, with CPython equivalents for the simulator and
+# the tools on the PC.
+
+try:
+    from time import sleep_ms, sleep_us, ticks_add, ticks_diff, ticks_us
+except ImportError:
+    from time import perf_counter_ns, sleep
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(end, start):
+        return end - start
+
+    def sleep_ms(ms):
+        sleep(ms / 1000)
+
+    def sleep_us(us):
+        sleep(us / 1000000)
@@ -5,6 +5,7 @@ setup(
     packages=find_packages(where='src'),
     package_dir={'': 'src'},
     install_requires=[
-        'matplotlib>=3.10.1'
+        'matplotlib>=3.10.1',
+        'numpy'
     ]
 )
\ No newline at end of file
@@ -0,0 +1,45 @@
+import argparse
+import socket
+
+from hexapod.telemetry import RECORD_SIZE, decode
+
+parser = argparse.ArgumentParser(description="Decode hexapod telemetry records.")
+parser.add_argument("--port", type=int, default=5005, help="UDP port to listen on.")
+parser.add_argument("--file", help="Decode a recorded telemetry file instead.")
+parser.add_argument("--every", type=int, default=50, help="Print every n records.")
+args = parser.parse_args()
+
+
+def batches():
+    """Yield raw batches of records from the file or the socket."""
+    if args.file:
+        with open(args.file, "rb") as f:
+            while True:
+                data = f.read(RECORD_SIZE * 256)
+                if not data:
+                    return
+                yield data
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("0.0.0.0", args.port))
+        print(f"Listening on UDP port {args.port}.")
+        while True:
+            yield sock.recv(65536)
+
+
+last_tick = None
+missed = 0
+worst_us = 0
+for data in batches():
+    for record in decode(data):
+        if last_tick is not None and record["tick"] != last_tick + 1:
+            missed += record["tick"] - last_tick - 1
+        last_tick = record["tick"]
+        worst_us = max(worst_us, record["duration_us"])
+        if record["failures"] or record["tick"] % args.every == 0:
+            angles = " ".join(f"{angle:7.2f}" for angle in record["angles"])
+            print(
+                f"tick {record['tick']:7d} {record['duration_us']:5d}us "
+                f"(worst {worst_us}us, missed {missed}) "
+                f"ik failures {record['failures']:06b} | {angles}"
+            )